@@ -3,20 +3,8 @@
 # --parents prevents error exit if folder already exists
 mkdir --parents dist
 
-loc_list=( "mensa-arcisstr" "mensa-arcisstrasse" "mensa-garching" "mensa-leopoldstr" "mensa-lothstr" \
-"mensa-martinsried" "mensa-pasing" "mensa-weihenstephan" "stubistro-arcisstr" "stubistro-goethestr" \
-"stubistro-großhadern" "stubistro-grosshadern" "stubistro-rosenheim" "stubistro-schellingstr" "stucafe-adalbertstr" \
-"stucafe-akademie-weihenstephan" "stucafe-boltzmannstr" "stucafe-garching" "stucafe-karlstr" "stucafe-pasing" \
-"ipp-bistro" "fmi-bistro" "mediziner-mensa" )
-
-for loc in "${loc_list[@]}"; do
-    python src/main.py "$loc" --jsonify "./dist/$loc"
-done
-
-openmensa_list=( "ipp-bistro" "fmi-bistro" )
-
-for loc in "${openmensa_list[@]}"; do
-    python src/main.py "$loc" --openmensa "./dist/$loc"
-done
+# parse all locations concurrently in a single process; the JSON files and the OpenMensa feed of every location are
+# written to ./dist/<location>
+python src/main.py --all --jsonify ./dist --openmensa ./dist
 
 tree dist/
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Queries the SQLite menu archive written with `main.py --archive DB`:
+
+    $ python src/archive.py DB [--location NAME ...] [--city CITY] [--from DATE] [--to DATE] [--next-week]
+                               [--vegan] [--with CODE ...] [--without CODE ...]
+"""
+
+import argparse
+import sqlite3
+from collections.abc import Mapping
+from contextlib import closing
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+import util
+from entities import Dish, IngredientSet
+from menu_parser import location_cities
+
+schema = """
+CREATE TABLE IF NOT EXISTS locations (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    city TEXT
+);
+CREATE TABLE IF NOT EXISTS days (
+    id INTEGER PRIMARY KEY,
+    location_id INTEGER NOT NULL REFERENCES locations (id),
+    date TEXT NOT NULL,
+    UNIQUE (location_id, date)
+);
+CREATE INDEX IF NOT EXISTS days_date ON days (date);
+CREATE TABLE IF NOT EXISTS dishes (
+    id INTEGER PRIMARY KEY,
+    day_id INTEGER NOT NULL REFERENCES days (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    price REAL,
+    price_text TEXT,
+    dish_type TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS dishes_day ON dishes (day_id, position);
+CREATE TABLE IF NOT EXISTS dish_ingredients (
+    dish_id INTEGER NOT NULL REFERENCES dishes (id) ON DELETE CASCADE,
+    code TEXT NOT NULL,
+    PRIMARY KEY (dish_id, code)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS dish_ingredients_code ON dish_ingredients (code, dish_id);
+"""
+
+
+class MenuArchive:
+    """
+    Archive of all parsed menus in an SQLite database.
+
+    Every location has one row per day; a day's dishes (in their original order) and their ingredient codes are
+    stored in their own tables. Days are indexed by location and date, ingredients by code, so queries across
+    locations and dates do not need to read any JSON file.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Args:
+            path: The path of the database file; it is created if it does not exist.
+        """
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(schema)
+        # archives written before the city column existed
+        if "city" not in [column[1] for column in self.connection.execute("PRAGMA table_info(locations)")]:
+            self.connection.execute("ALTER TABLE locations ADD COLUMN city TEXT")
+        self.days_written = 0
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, menus_by_location) -> None:
+        """
+        Writes the menus of all locations in a single transaction. Days already in the archive are replaced.
+
+        Args:
+            menus_by_location: Maps every location to its menus (a mapping or iterable of `Menu` objects).
+        """
+        with self.connection:
+            for location, menus in menus_by_location.items():
+                if isinstance(menus, Mapping):
+                    menus = menus.values()
+                location_id = self.get_location_id(location)
+                for menu in menus:
+                    self.write_menu(location_id, menu)
+
+    def get_location_id(self, location: str) -> int:
+        self.connection.execute("INSERT OR IGNORE INTO locations (name) VALUES (?)", (location,))
+        self.connection.execute("UPDATE locations SET city = ? WHERE name = ?",
+                                (location_cities.get(location), location))
+        return self.connection.execute("SELECT id FROM locations WHERE name = ?", (location,)).fetchone()[0]
+
+    def write_menu(self, location_id: int, menu) -> None:
+        # the dishes and ingredients of a replaced day are deleted by the cascade
+        self.connection.execute("DELETE FROM days WHERE location_id = ? AND date = ?",
+                                (location_id, str(menu.menu_date)))
+        day_id = self.connection.execute("INSERT INTO days (location_id, date) VALUES (?, ?)",
+                                         (location_id, str(menu.menu_date))).lastrowid
+        for position, dish in enumerate(menu.dishes):
+            is_text = isinstance(dish.price, str)
+            dish_id = self.connection.execute(
+                "INSERT INTO dishes (day_id, position, name, price, price_text, dish_type) VALUES (?, ?, ?, ?, ?, ?)",
+                (day_id, position, dish.name, None if is_text else dish.price, dish.price if is_text else None,
+                 dish.dish_type)).lastrowid
+            self.connection.executemany("INSERT INTO dish_ingredients (dish_id, code) VALUES (?, ?)",
+                                        [(dish_id, code) for code in dish.ingredients.codes])
+        self.days_written += 1
+
+    def find_dishes(self, locations: Optional[Iterable[str]] = None, city: Optional[str] = None,
+                    start: Optional[date] = None, end: Optional[date] = None, vegan: bool = False,
+                    with_codes: Iterable[str] = (), without_codes: Iterable[str] = ()) -> List[Tuple[str, date, Dish]]:
+        """
+        Returns all dishes matching every given filter, sorted by date, location and their position in the menu.
+
+        Args:
+            locations: The names of the locations to search.
+            city: The city of the locations to search (e.g. "Garching", case insensitive; see
+                `menu_parser.location_cities`).
+            start: The first date to search.
+            end: The last date to search.
+            vegan: Whether to return only vegan dishes.
+            with_codes: Ingredient codes every returned dish must contain.
+            without_codes: Ingredient codes (e.g. allergens) no returned dish may contain.
+
+        Returns:
+            A list of (location, date, dish) tuples.
+        """
+        conditions = []
+        parameters = []
+        if locations is not None:
+            locations = list(locations)
+            conditions.append("locations.name IN (%s)" % ", ".join("?" * len(locations)))
+            parameters.extend(locations)
+        if city is not None:
+            conditions.append("lower(locations.city) = lower(?)")
+            parameters.append(city)
+        if start is not None:
+            conditions.append("days.date >= ?")
+            parameters.append(str(start))
+        if end is not None:
+            conditions.append("days.date <= ?")
+            parameters.append(str(end))
+        with_codes = list(with_codes) + ([IngredientSet.vegan_code] if vegan else [])
+        for code in with_codes:
+            conditions.append("EXISTS (SELECT 1 FROM dish_ingredients WHERE dish_id = dishes.id AND code = ?)")
+            parameters.append(code)
+        for code in without_codes:
+            conditions.append("NOT EXISTS (SELECT 1 FROM dish_ingredients WHERE dish_id = dishes.id AND code = ?)")
+            parameters.append(code)
+
+        query = """
+            SELECT locations.name, days.date, dishes.name, dishes.price, dishes.price_text, dishes.dish_type,
+                   (SELECT group_concat(code, ',') FROM dish_ingredients WHERE dish_id = dishes.id)
+            FROM days
+            JOIN locations ON locations.id = days.location_id
+            JOIN dishes ON dishes.day_id = days.id
+            %s
+            ORDER BY days.date, locations.name, dishes.position
+        """ % ("WHERE " + " AND ".join(conditions) if conditions else "")
+        with closing(self.connection.execute(query, parameters)) as cursor:
+            return [(location, datetime.strptime(day, "%Y-%m-%d").date(),
+                     Dish(name, price if price is not None else price_text, codes.split(",") if codes else (),
+                          dish_type))
+                    for location, day, name, price, price_text, dish_type, codes in cursor]
+
+    def __repr__(self):
+        return "archive: %d days written" % self.days_written
+
+
+def get_next_week(today: date) -> Tuple[date, date]:
+    """Returns the monday and sunday of the week after `today`."""
+    monday = today - timedelta(days=today.weekday()) + timedelta(weeks=1)
+    return monday, monday + timedelta(days=6)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Finds dishes in the menu archive written with --archive.")
+    parser.add_argument('database', metavar='DB', help='the archive database')
+    parser.add_argument('-l', '--location', action='append', metavar='NAME',
+                        help='only search the location NAME (may be given more than once)')
+    parser.add_argument('-c', '--city', metavar='CITY',
+                        help='only search the locations in CITY (e.g. garching)')
+    parser.add_argument('--from', dest='start', metavar='DATE',
+                        help='first date (%s) to search' % util.cli_date_format)
+    parser.add_argument('--to', dest='end', metavar='DATE', help='last date (%s) to search' % util.cli_date_format)
+    parser.add_argument('--next-week', action='store_true', help='only search the next week')
+    parser.add_argument('--vegan', action='store_true', help='only find vegan dishes')
+    parser.add_argument('--with', dest='with_codes', action='append', default=[], metavar='CODE',
+                        help='only find dishes with the ingredient CODE (may be given more than once)')
+    parser.add_argument('--without', dest='without_codes', action='append', default=[], metavar='CODE',
+                        help='only find dishes without the ingredient CODE (may be given more than once)')
+    args = parser.parse_args()
+
+    try:
+        start = util.parse_date(args.start) if args.start is not None else None
+        end = util.parse_date(args.end) if args.end is not None else None
+    except ValueError:
+        parser.error("dates are required in the format %s" % util.cli_date_format)
+    if args.next_week:
+        start, end = get_next_week(date.today())
+
+    with MenuArchive(args.database) as archive:
+        for location, day, dish in archive.find_dishes(args.location, args.city, start, end, args.vegan,
+                                                       args.with_codes, args.without_codes):
+            print("%s %s: %s" % (day, location, dish))
+
+
+if __name__ == "__main__":
+    main()
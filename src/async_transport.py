@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+import aiohttp
+
+
+class AsyncTransport:
+    """
+    Non-blocking counterpart of `transport.Transport` for `MenuParser.parse_async`.
+
+    Keeps a keep-alive connection pool with a per-host connection limit on a single `aiohttp.ClientSession`. Use it
+    as async context manager, so the session is closed when all locations have been parsed:
+
+        async with AsyncTransport() as client:
+            menus = await parser.parse_async(location, client)
+    """
+
+    def __init__(self, pool_size: int = 10, max_per_host: int = 4, timeout: float = 30.0) -> None:
+        """
+        Args:
+            pool_size: The maximum number of open connections.
+            max_per_host: The maximum number of concurrent connections to the same host.
+            timeout: Timeout in seconds for connecting to and reading from a host.
+        """
+        self.pool_size = pool_size
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.session = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.max_per_host)
+        self.session = aiohttp.ClientSession(
+            connector=connector, timeout=aiohttp.ClientTimeout(sock_connect=self.timeout, sock_read=self.timeout))
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def fetch(self, url: str) -> bytes:
+        """
+        Returns the body of the resource at `url`.
+
+        Raises:
+            aiohttp.ClientResponseError: If the server answered with an error status code.
+        """
+        async with self.session.get(url) as response:
+            response.raise_for_status()
+            return await response.read()
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ParseResult:
+    """The outcome of parsing the menus of a single location."""
+
+    def __init__(self, location, menus=None, error=None):
+        self.location = location
+        self.menus = menus
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None and self.menus is not None
+
+    def __repr__(self):
+        if self.ok:
+            return "%s: OK (%d menus)" % (self.location, len(self.menus))
+        elif self.error is not None:
+            return "%s: FAILED (%s: %s)" % (self.location, type(self.error).__name__, self.error)
+        else:
+            return "%s: FAILED (no menus found)" % self.location
+
+
+def parse_location(location, get_parser):
+    """
+    Parses the menus of a single location and captures every error, so that one broken location does not abort
+    a whole batch run.
+
+    Args:
+        location: The location to parse.
+        get_parser: A callable returning the parser for a location (e.g. `main.get_menu_parsing_strategy`).
+    """
+    try:
+        parser = get_parser(location)
+        if parser is None:
+            raise ValueError("The selected location '%s' does not exist." % location)
+        return ParseResult(location, menus=parser.parse(location))
+    except Exception as e:
+        return ParseResult(location, error=e)
+
+
+async def parse_location_async(location, get_parser, client):
+    """Like `parse_location`, but parses the location with `parse_async` on the running event loop."""
+    try:
+        parser = get_parser(location)
+        if parser is None:
+            raise ValueError("The selected location '%s' does not exist." % location)
+        return ParseResult(location, menus=await parser.parse_async(location, client))
+    except Exception as e:
+        return ParseResult(location, error=e)
+
+
+def plan_fetches(locations, get_parser):
+    """
+    Groups locations whose menus are scraped from the same source (e.g. the aliases "mensa-arcisstr" and
+    "mensa-arcisstrasse" of Studentenwerk location 421).
+
+    Args:
+        locations: The locations to parse.
+        get_parser: A callable returning the parser for a location (e.g. `main.get_menu_parsing_strategy`).
+
+    Returns:
+        An ordered dictionary mapping the fetch key of every source to the list of its locations (in the order of
+        `locations`, duplicates removed).
+    """
+    plan = OrderedDict()
+    for location in locations:
+        parser = get_parser(location)
+        # unknown locations get their own group so that they are reported as failed
+        key = parser.get_fetch_key(location) if parser is not None else (None, location)
+        aliases = plan.setdefault(key, [])
+        if location not in aliases:
+            aliases.append(location)
+    return plan
+
+
+def parse_locations(locations, get_parser, workers=8):
+    """
+    Parses all passed locations concurrently on a bounded thread pool. Every source is fetched and parsed only once,
+    even if several of the locations are aliases of it; the parsed menus are shared by all aliases.
+
+    Args:
+        locations: The locations to parse.
+        get_parser: A callable returning the parser for a location (e.g. `main.get_menu_parsing_strategy`).
+        workers: The maximum number of locations parsed at the same time.
+
+    Returns:
+        A list of `ParseResult` in the same order as `locations` (duplicates removed).
+    """
+    plan = plan_fetches(locations, get_parser)
+    # parse the first location of each group only
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        group_results = list(executor.map(lambda aliases: parse_location(aliases[0], get_parser), plan.values()))
+    return fan_out(locations, plan, group_results)
+
+
+async def parse_locations_async(locations, get_parser, client):
+    """
+    Like `parse_locations`, but parses all locations concurrently on the running event loop using `parse_async`.
+
+    Args:
+        locations: The locations to parse.
+        get_parser: A callable returning the parser for a location (e.g. `main.get_menu_parsing_strategy`).
+        client: The async transport (e.g. `async_transport.AsyncTransport`) all downloads go through.
+    """
+    plan = plan_fetches(locations, get_parser)
+    group_results = await asyncio.gather(
+        *[parse_location_async(aliases[0], get_parser, client) for aliases in plan.values()])
+    return fan_out(locations, plan, group_results)
+
+
+def fan_out(locations, plan, group_results):
+    # pass the result of each group on to all its locations
+    results = {}
+    for aliases, group_result in zip(plan.values(), group_results):
+        for location in aliases:
+            results[location] = ParseResult(location, menus=group_result.menus, error=group_result.error)
+    return [results[location] for location in OrderedDict.fromkeys(locations)]
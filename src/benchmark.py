@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Micro benchmarks of the parsers, run on the test assets:
+
+    $ python src/benchmark.py [-n NUMBER] [-r REPEAT] [benchmark ...]
+"""
+
+import argparse
+import atexit
+import os
+import shutil
+import tempfile
+import timeit
+from collections import OrderedDict
+
+from lxml import html
+
+import menu_parser
+
+assets_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test", "assets")
+
+
+def read_asset(*path):
+    with open(os.path.join(assets_dir, *path), "r", encoding="utf-8") as asset:
+        return asset.read()
+
+
+def bench_studentenwerk():
+    # parsing the page itself is part of the benchmark, since get_menus used to re-parse every day
+    parser = menu_parser.StudentenwerkMenuParser()
+    page = read_asset("studentenwerk", "in", "speiseplan_mensa_arcisstrasse.html")
+    return lambda: parser.get_menus(html.fromstring(page), "mensa-arcisstr")
+
+
+def read_mediziner_texts():
+    return [(read_asset("mediziner-mensa", "in", "menu_kw_44_2018.txt"), 2018, 44),
+            (read_asset("mediziner-mensa", "in", "menu_kw_47_2018.txt"), 2018, 47)]
+
+
+def bench_mediziner():
+    # both weekly fixtures, i.e. 14 days with their soups and main dishes
+    parser = menu_parser.MedizinerMensaMenuParser()
+    texts = read_mediziner_texts()
+    return lambda: [parser.get_menus(text, year, week_number) for text, year, week_number in texts]
+
+
+def bench_mediziner_dishes():
+    # only parse_dish, called with all dish strings of both weekly fixtures
+    dish_strs = []
+
+    class DishRecorder(menu_parser.MedizinerMensaMenuParser):
+        def parse_dish(self, dish_str, dish_type="Tagesgericht"):
+            dish_strs.append((dish_str, dish_type))
+            return super().parse_dish(dish_str, dish_type)
+
+    for text, year, week_number in read_mediziner_texts():
+        DishRecorder().get_menus(text, year, week_number)
+    parser = menu_parser.MedizinerMensaMenuParser()
+    return lambda: [parser.parse_dish(dish_str, dish_type) for dish_str, dish_type in dish_strs]
+
+
+def bench_jsonify():
+    # writes the weekly and the combined JSON files of mensa-arcisstr into a temporary directory
+    import main
+    from entities import CalendarIndex
+
+    parser = menu_parser.StudentenwerkMenuParser()
+    weeks = CalendarIndex(parser.get_menus(
+        html.fromstring(read_asset("studentenwerk", "in", "speiseplan_mensa_arcisstrasse.html")), "mensa-arcisstr"))
+    directory = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, directory)
+    return lambda: main.jsonify(weeks, directory, "mensa-arcisstr", True)
+
+
+benchmarks = OrderedDict([
+    ("studentenwerk", bench_studentenwerk),
+    ("mediziner", bench_mediziner),
+    ("mediziner-dishes", bench_mediziner_dishes),
+    ("jsonify", bench_jsonify),
+])
+"""Maps the name of every benchmark to a function returning the callable to be timed."""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs micro benchmarks of the parsers on the test assets.")
+    parser.add_argument('benchmark', nargs='*', metavar='benchmark',
+                        help='the benchmarks to run; one of {%s} (default: all)' % ','.join(benchmarks))
+    parser.add_argument('-n', '--number', type=int, default=50,
+                        help='number of calls per measurement (default: %(default)s)')
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help='number of measurements; the best one is reported (default: %(default)s)')
+    args = parser.parse_args()
+    for name in args.benchmark:
+        if name not in benchmarks:
+            parser.error("argument benchmark: invalid choice: '%s'" % name)
+
+    for name in args.benchmark or benchmarks:
+        stmt = benchmarks[name]()
+        times = timeit.repeat(stmt, number=args.number, repeat=args.repeat)
+        print("%s: %.3f ms per call (best of %d)" % (name, min(times) / args.number * 1000, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,21 +4,106 @@ import argparse
 
 import menu_parser
 
+locations = (['fmi-bistro', 'ipp-bistro', 'mediziner-mensa']
+             + list(menu_parser.StudentenwerkMenuParser.location_id_mapping.keys()))
+"""All locations a menu parser exists for."""
+
 
 def parse_cli_args():
     parser = argparse.ArgumentParser()
-    parser.add_argument('location', choices=(
-            ['fmi-bistro', 'ipp-bistro', 'mediziner-mensa']
-            + list(menu_parser.StudentenwerkMenuParser.location_id_mapping.keys())),
-                        help='the location you want to eat at')
+    # choices are checked below, since argparse rejects an empty list for nargs='*' with choices
+    parser.add_argument('location', nargs='*', metavar='location',
+                        help='the location(s) you want to eat at; one of {%s}' % ','.join(locations))
+    parser.add_argument('-a', '--all', action='store_true',
+                        help='parse all supported locations in one run; output is written to <PATH>/<location>')
+    parser.add_argument('-w', '--workers', type=int, default=8,
+                        help='number of locations parsed concurrently if more than one location is given '
+                             '(default: %(default)s)')
+    parser.add_argument('--asyncio', action='store_true',
+                        help='parse all locations on a single asyncio event loop instead of a thread pool if more '
+                             'than one location is given (the HTTP cache of --cache-dir is not used)')
+    parser.add_argument('--pool-size', type=int, default=10,
+                        help='number of HTTP connections kept alive per host (default: %(default)s)')
+    parser.add_argument('--max-per-host', type=int, default=4,
+                        help='maximum number of concurrent HTTP requests per host (default: %(default)s)')
+    parser.add_argument('--timeout', type=float, default=30.0,
+                        help='HTTP connect and read timeout in seconds (default: %(default)s)')
+    parser.add_argument('--cache-dir', metavar='PATH',
+                        help='directory for persistent caches of HTTP responses, extracted PDF texts and parsed '
+                             'menus; cached pages are revalidated with conditional requests (ETag/Last-Modified)')
+    parser.add_argument('--max-age', type=float, metavar='SECONDS',
+                        help='use cached pages younger than SECONDS without any network access (requires --cache-dir)')
+    parser.add_argument('--replay', metavar='DIR',
+                        help='serve all downloads from the responses recorded in DIR instead of the network '
+                             '(see --record)')
+    parser.add_argument('--record', metavar='DIR',
+                        help='record all downloaded responses into DIR for later use with --replay')
+    parser.add_argument('--stream', action='store_true',
+                        help='parse Studentenwerk pages incrementally while they are downloaded to keep the memory '
+                             'usage flat (parsed menus are not cached in --cache-dir)')
+    parser.add_argument('--pdf-workers', type=int, default=4, metavar='WORKERS',
+                        help='number of weekly PDFs of a location downloaded and parsed in parallel '
+                             '(default: %(default)s)')
+    parser.add_argument('--pdf-cache-size', type=int, default=64, metavar='MB',
+                        help='maximum size of the cache of extracted PDF texts in --cache-dir (default: %(default)s)')
+    parser.add_argument('--pdftotext-jobs', type=int, default=2, metavar='JOBS',
+                        help='maximum number of pdftotext processes running in parallel (default: %(default)s)')
+    parser.add_argument('--pdftotext-timeout', type=float, default=60.0, metavar='SECONDS',
+                        help='seconds after which a pdftotext process gets killed (default: %(default)s)')
     parser.add_argument('-d', '--date', help='date (DD.MM.YYYY) of the day of which you want to get the menu')
     parser.add_argument('-j', '--jsonify',
                         help="directory for JSON output (date parameter will be ignored if this argument is used)",
                         metavar="PATH")
+    parser.add_argument('--compact', action='store_true',
+                        help='write JSON output without indentation (uses orjson if it is installed)')
+    parser.add_argument('--precompress', action='store_true',
+                        help='write gzip (and, if the brotli module is installed, brotli) compressed copies of all '
+                             'output files next to them (<file>.gz, <file>.br); only changed files are recompressed')
+    parser.add_argument('--compress-level', type=int, default=9, metavar='LEVEL',
+                        help='compression level (1-9) of --precompress (default: %(default)s)')
     parser.add_argument('-c', '--combine', action='store_true',
                         help='creates a "combined.json" file containing all dishes for the location specified')
+    parser.add_argument('--history', metavar='PATH',
+                        help='directory of a persistent, append-only history of all parsed menus (one subdirectory '
+                             'per location); with --combine, "combined.json" contains all weeks of the history')
+    parser.add_argument('--archive', metavar='DB',
+                        help='also write all parsed menus into the SQLite database DB (see src/archive.py for queries)')
+    parser.add_argument('--snapshot', metavar='PATH',
+                        help='also write all parsed menus into the binary snapshot file PATH (see src/snapshot.py)')
     parser.add_argument('--openmensa', 
                         help="directory for OpenMensa XML output (date parameter will be ignored if this argument is used)",
                         metavar="PATH")
     args = parser.parse_args()
+
+    for location in args.location:
+        if location not in locations:
+            parser.error("argument location: invalid choice: '%s' (choose from %s)"
+                         % (location, ', '.join("'%s'" % l for l in locations)))
+    if args.all:
+        args.location = list(locations)
+    if not args.location:
+        parser.error("either a location or --all is required")
+    if args.workers < 1:
+        parser.error("argument -w/--workers: must be at least 1")
+    if args.pool_size < 1:
+        parser.error("argument --pool-size: must be at least 1")
+    if args.max_per_host < 1:
+        parser.error("argument --max-per-host: must be at least 1")
+    if args.pdf_workers < 1:
+        parser.error("argument --pdf-workers: must be at least 1")
+    if args.pdftotext_jobs < 1:
+        parser.error("argument --pdftotext-jobs: must be at least 1")
+    if not 1 <= args.compress_level <= 9:
+        parser.error("argument --compress-level: must be between 1 and 9")
+    if args.max_age is not None and args.cache_dir is None:
+        parser.error("argument --max-age: requires --cache-dir")
+    if args.replay is not None and args.record is not None:
+        parser.error("argument --record: not allowed with argument --replay")
+    if args.replay is not None and args.asyncio:
+        parser.error("argument --replay: not allowed with argument --asyncio")
+    if (len(args.location) > 1 and args.jsonify is None and args.openmensa is None and args.archive is None
+            and args.snapshot is None):
+        parser.error("--jsonify, --openmensa, --archive or --snapshot is required when parsing more than one "
+                     "location")
+
     return args
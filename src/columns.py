@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+from typing import List, Optional, Sequence, Tuple
+
+
+class ColumnLayout:
+    """
+    The columns of a table rendered as text (e.g. by `pdftotext -layout`).
+
+    Every column is a span of character positions `(start, end)`; `end` may be None for a column reaching to the end
+    of the line. The boundaries are detected once per table and then applied to all its lines:
+
+        layout = ColumnLayout.from_anchors(lines[0], ["Montag", "Dienstag", "Mittwoch", "Donnerstag", "Freitag"])
+        monday, tuesday, wednesday, thursday, friday = layout.join(lines)
+    """
+
+    def __init__(self, spans: Sequence[Tuple[int, Optional[int]]]) -> None:
+        self.spans = list(spans)
+
+    @classmethod
+    def from_starts(cls, starts: Sequence[int]):
+        """Returns adjoining columns beginning at `starts`; the last column reaches to the end of the line."""
+        return cls(zip(starts, list(starts[1:]) + [None]))
+
+    @classmethod
+    def from_anchors(cls, header_line: str, anchors: Sequence[str]):
+        """
+        Returns adjoining columns beginning where the header line contains the anchors (e.g. the weekdays).
+
+        Raises:
+            ValueError: If an anchor is missing in the header line.
+        """
+        starts = []
+        for anchor in anchors:
+            start = header_line.find(anchor)
+            if start < 0:
+                raise ValueError("Column '%s' not found in table header '%s'" % (anchor, header_line.strip()))
+            starts.append(start)
+        return cls.from_starts(starts)
+
+    def split(self, lines: Sequence[str]) -> List[List[str]]:
+        """Returns the cells of all columns: one list per column containing the part of every line in this column."""
+        columns = [[] for _ in self.spans]
+        for line in lines:
+            for cells, (start, end) in zip(columns, self.spans):
+                cells.append(line[start:end])
+        return columns
+
+    def join(self, lines: Sequence[str], separator: str = " ") -> List[str]:
+        """Returns the text of every column; each of its cells is preceded by `separator`."""
+        return ["".join(separator + cell for cell in cells) for cells in self.split(lines)]
+
+    def __repr__(self):
+        return "ColumnLayout(%r)" % self.spans
@@ -2,18 +2,210 @@
 
 import json
 import re
-from typing import Dict, Optional, Sequence
+import sys
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from collections.abc import Mapping, Set
+from datetime import date
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+class IngredientRegistry:
+    """
+    Assigns every ingredient code a bit position, so that sets of ingredients can be stored as int bitmasks.
+
+    The codes of `Ingredients.ingredient_lookup` are registered up front; codes not contained there (e.g. "Si" of the
+    FMI Bistro) get the next free bit when they are seen for the first time.
+    """
+
+    def __init__(self, codes: Iterable[str]) -> None:
+        self._bits = {}
+        self._codes = []
+        # maps a mask to the sorted tuple of its codes and the hash of the set
+        self._entries = {}
+        self._lock = threading.Lock()
+        for code in codes:
+            self.get_bit(code)
+
+    def find_bit(self, code: str) -> Optional[int]:
+        """Returns the bit of `code` or None if the code has not been registered yet."""
+        return self._bits.get(code)
+
+    def get_bit(self, code: str) -> int:
+        """Returns the bit of `code`, registering the code if needed."""
+        bit = self._bits.get(code)
+        if bit is None:
+            with self._lock:
+                bit = self._bits.get(code)
+                if bit is None:
+                    bit = 1 << len(self._codes)
+                    self._codes.append(sys.intern(code))
+                    self._bits[self._codes[-1]] = bit
+        return bit
+
+    def get_mask(self, codes: Iterable[str]) -> int:
+        mask = 0
+        for code in codes:
+            mask |= self.get_bit(code)
+        return mask
+
+    def get_entry(self, mask: int) -> Tuple[Tuple[str, ...], int]:
+        entry = self._entries.get(mask)
+        if entry is None:
+            codes = tuple(sorted(code for position, code in enumerate(self._codes) if mask >> position & 1))
+            # the same hash as a frozenset of the codes, since both compare equal
+            entry = self._entries.setdefault(mask, (codes, hash(frozenset(codes))))
+        return entry
+
+    def get_codes(self, mask: int) -> Tuple[str, ...]:
+        """Returns the sorted codes of `mask`; the result is computed once per mask."""
+        return self.get_entry(mask)[0]
+
+
+class IngredientSet(Set):
+    """
+    Immutable set of ingredient codes, stored as bitmask of the `ingredient_registry`.
+
+    Union, intersection, comparison and containment checks are plain integer operations. Iterating yields the codes
+    in sorted order, like they are written to the JSON output. An `IngredientSet` compares equal to a `set` or
+    `frozenset` of the same codes.
+    """
+
+    __slots__ = ("mask",)
+
+    # codes used by the filters
+    vegan_code = "v"
+    pork_code = "S"
+
+    def __init__(self, codes: Iterable[str] = ()) -> None:
+        self.mask = codes.mask if isinstance(codes, IngredientSet) else ingredient_registry.get_mask(codes)
+
+    @classmethod
+    def from_mask(cls, mask: int):
+        ingredient_set = cls.__new__(cls)
+        ingredient_set.mask = mask
+        return ingredient_set
+
+    @property
+    def codes(self) -> Tuple[str, ...]:
+        """The sorted codes of this set."""
+        return ingredient_registry.get_codes(self.mask)
+
+    def __contains__(self, code):
+        bit = ingredient_registry.find_bit(code)
+        return bit is not None and self.mask & bit != 0
+
+    def __iter__(self):
+        return iter(self.codes)
+
+    def __len__(self):
+        return bin(self.mask).count("1")
+
+    def __eq__(self, other):
+        if isinstance(other, IngredientSet):
+            return self.mask == other.mask
+        return Set.__eq__(self, other)
+
+    def __le__(self, other):
+        if isinstance(other, IngredientSet):
+            return self.mask & ~other.mask == 0
+        return Set.__le__(self, other)
+
+    def __ge__(self, other):
+        if isinstance(other, IngredientSet):
+            return other.mask & ~self.mask == 0
+        return Set.__ge__(self, other)
+
+    def __or__(self, other):
+        return IngredientSet.from_mask(self.mask | IngredientSet(other).mask)
+
+    def __and__(self, other):
+        return IngredientSet.from_mask(self.mask & IngredientSet(other).mask)
+
+    def __sub__(self, other):
+        return IngredientSet.from_mask(self.mask & ~IngredientSet(other).mask)
+
+    __ror__ = __or__
+    __rand__ = __and__
+
+    def union(self, *others):
+        mask = self.mask
+        for other in others:
+            mask |= IngredientSet(other).mask
+        return IngredientSet.from_mask(mask)
+
+    def __hash__(self):
+        return ingredient_registry.get_entry(self.mask)[1]
+
+    def __reduce__(self):
+        # bit positions of codes registered at runtime differ between processes, so pickle the codes
+        return IngredientSet, (self.codes,)
+
+    def __repr__(self):
+        return "IngredientSet(%r)" % (list(self.codes),)
+
+    def is_vegan(self) -> bool:
+        return self.vegan_code in self
+
+    def contains_pork(self) -> bool:
+        return self.pork_code in self
+
+    def is_free_of(self, codes: Iterable[str]) -> bool:
+        """Returns whether none of the ingredients (e.g. allergens) `codes` is contained."""
+        return self.mask & ingredient_registry.get_mask(codes) == 0
 
 
 class Dish:
+    """
+    An immutable dish. Its hash is computed once on construction; name and dish type are interned, since the same
+    strings occur in many menus. Use `replace` to get a modified copy.
+    """
+
+    __slots__ = ("name", "price", "ingredients", "dish_type", "_hash")
+
     def __init__(self, name, price, ingredients, dish_type):
-        self.name = name
         try:
-            self.price = float(price)
+            price = float(price)
         except ValueError:
-            self.price = price
-        self.ingredients = ingredients
-        self.dish_type = dish_type
+            pass
+        ingredients = IngredientSet(ingredients)
+        object.__setattr__(self, "name", sys.intern(name) if isinstance(name, str) else name)
+        object.__setattr__(self, "price", price)
+        object.__setattr__(self, "ingredients", ingredients)
+        object.__setattr__(self, "dish_type", sys.intern(dish_type) if isinstance(dish_type, str) else dish_type)
+        # http://stackoverflow.com/questions/4005318/how-to-implement-a-good-hash-function-in-python
+        object.__setattr__(self, "_hash", (hash(self.name) << 1) ^ hash(price) ^ hash(ingredients))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("'%s' object is immutable" % type(self).__name__)
+
+    __delattr__ = __setattr__
+
+    @classmethod
+    def from_markers(cls, name, price, location: str, markers: Iterable[str], dish_type):
+        """
+        Creates a dish whose ingredients are parsed from raw marker strings of a location.
+
+        Args:
+            location: The location, which determines the ingredient codes used by `markers`.
+            markers: Strings of comma separated ingredient codes (e.g. "Mi,Gl"); their parsed values are cached.
+        """
+        ingredients = Ingredients(location)
+        for marker in markers:
+            ingredients.parse_ingredients(marker)
+        return cls(name, price, ingredients.ingredient_set, dish_type)
+
+    def replace(self, **changes):
+        """Returns a copy of this dish with the given attributes (e.g. `name` or `dish_type`) changed."""
+        attributes = {"name": self.name, "price": self.price, "ingredients": self.ingredients,
+                      "dish_type": self.dish_type}
+        attributes.update(changes)
+        return Dish(**attributes)
+
+    def __reduce__(self):
+        return Dish, (self.name, self.price, self.ingredients, self.dish_type)
 
     def __repr__(self):
         if type(self.price) is not str:
@@ -23,7 +215,8 @@ class Dish:
 
     def __eq__(self, other):
         if isinstance(other, self.__class__):
-            return (self.name == other.name
+            return (self._hash == other._hash
+                    and self.name == other.name
                     and self.price == other.price
                     and self.ingredients == other.ingredients
                     and self.dish_type == other.dish_type)
@@ -32,43 +225,50 @@ class Dish:
     def to_json_obj(self):
         return {"name": self.name,
                 "price": self.price,
-                "ingredients": sorted(self.ingredients),
+                "ingredients": list(self.ingredients.codes),
                 "dish_type": self.dish_type}
 
     def __hash__(self):
-        # http://stackoverflow.com/questions/4005318/how-to-implement-a-good-hash-function-in-python
-        return (hash(self.name) << 1) ^ hash(self.price) ^ hash(frozenset(self.ingredients))
+        return self._hash
 
 
 class Menu:
+    """An immutable menu: the dishes of a day, stored as tuple."""
+
+    __slots__ = ("menu_date", "dishes")
+
     def __init__(self, menu_date, dishes):
-        self.menu_date = menu_date
-        self.dishes = dishes
+        object.__setattr__(self, "menu_date", menu_date)
+        object.__setattr__(self, "dishes", tuple(dishes))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("'%s' object is immutable" % type(self).__name__)
+
+    __delattr__ = __setattr__
+
+    def __reduce__(self):
+        return Menu, (self.menu_date, self.dishes)
 
     def __repr__(self):
-        menu_str = str(self.menu_date) + ": " + str(self.dishes)
+        menu_str = str(self.menu_date) + ": " + str(list(self.dishes))
         return menu_str
 
     def __eq__(self, other):
         if isinstance(other, self.__class__):
-            dishes_equal = set(self.dishes) == set(other.dishes)
-            date_equal = self.menu_date == other.menu_date
-            return dishes_equal and date_equal
+            if self.menu_date != other.menu_date:
+                return False
+            # the dishes are compared as sets, but most of the time they are in the same order anyway
+            return self.dishes == other.dishes or set(self.dishes) == set(other.dishes)
         return False
 
     def remove_duplicates(self):
-        unique = []
-        seen = set()
-
-        for d in self.dishes:
-            if d not in seen:
-                unique.append(d)
-                seen.add(d)
-
-        self.dishes = unique
+        """Returns a copy of this menu without duplicate dishes (keeping the first one)."""
+        return Menu(self.menu_date, dict.fromkeys(self.dishes))
 
 
 class Week:
+    __slots__ = ("calendar_week", "year", "days")
+
     def __init__(self, calendar_week, year, days):
         self.calendar_week = calendar_week
         self.year = year
@@ -93,23 +293,90 @@ class Week:
 
     @staticmethod
     def to_weeks(menus):
-        weeks = {}
-        for menu_key in menus:
-            menu = menus[menu_key]
-            menu_date = menu.menu_date
-            # get calendar week
-            calendar_week = menu_date.isocalendar()[1]
-            # get year of the calendar week. watch out that for instance jan 01 can still be in week 52 of the
-            # previous year
-            year_of_calendar_week = menu_date.year - 1 \
-                if calendar_week == 52 and menu_date.month == 1 else menu_date.year
+        """
+        Groups menus by calendar week number. Kept for compatibility: weeks of different years with the same number
+        collide, use `CalendarIndex` instead.
+        """
+        return {week.calendar_week: week for week in CalendarIndex(menus).values()}
+
+
+class CalendarIndex(Mapping):
+    """
+    Menus indexed by ISO calendar week.
+
+    Maps `(iso_year, iso_week)` to the `Week` containing the menus of that week, iterating in chronological order.
+    The days of every week are kept sorted by date, so that range queries are binary searches. New menus can be
+    inserted at any time; a menu replaces an existing one of the same date.
+    """
+
+    def __init__(self, menus=()) -> None:
+        """
+        Args:
+            menus: The menus to index, either as iterable or as dictionary mapping dates to menus (like returned by
+                the parsers).
+        """
+        self._weeks = {}
+        # sorted list of the keys of self._weeks
+        self._week_keys = []
+        # sorted list of the dates of all menus and the menus in the same order
+        self._dates = []
+        self._menus = []
+        if isinstance(menus, Mapping):
+            menus = menus.values()
+        for menu in menus:
+            self.insert(menu)
+
+    def insert(self, menu: Menu) -> None:
+        menu_date = menu.menu_date
+        index = bisect_left(self._dates, menu_date)
+        replace = index < len(self._dates) and self._dates[index] == menu_date
+        if replace:
+            self._menus[index] = menu
+        else:
+            self._dates.insert(index, menu_date)
+            self._menus.insert(index, menu)
+
+        iso_year, iso_week, _ = menu_date.isocalendar()
+        week = self._weeks.get((iso_year, iso_week))
+        if week is None:
+            week = self._weeks[(iso_year, iso_week)] = Week(iso_week, iso_year, [])
+            insort(self._week_keys, (iso_year, iso_week))
+        day_index = bisect_left([day.menu_date for day in week.days], menu_date)
+        if replace:
+            week.days[day_index] = menu
+        else:
+            week.days.insert(day_index, menu)
+
+    def __getitem__(self, key: Tuple[int, int]) -> Week:
+        return self._weeks[key]
+
+    def __iter__(self):
+        return iter(self._week_keys)
 
-            # append menus to respective week
-            week = weeks.get(calendar_week, Week(calendar_week, year_of_calendar_week, []))
-            week.days.append(menu)
-            weeks[calendar_week] = week
+    def __len__(self):
+        return len(self._week_keys)
 
-        return weeks
+    def week(self, iso_year: int, iso_week: int) -> Optional[Week]:
+        """Returns the week `iso_week` of `iso_year` or None if there is no menu in that week."""
+        return self._weeks.get((iso_year, iso_week))
+
+    def menu(self, menu_date: date) -> Optional[Menu]:
+        """Returns the menu of `menu_date` or None if there is none."""
+        index = bisect_left(self._dates, menu_date)
+        if index < len(self._dates) and self._dates[index] == menu_date:
+            return self._menus[index]
+        return None
+
+    def today(self) -> Optional[Menu]:
+        return self.menu(date.today())
+
+    def between(self, start: date, end: date) -> List[Menu]:
+        """Returns the menus from `start` to `end` (both inclusive) sorted by date."""
+        return self._menus[bisect_left(self._dates, start):bisect_right(self._dates, end)]
+
+    def menus(self) -> List[Menu]:
+        """Returns all menus sorted by date."""
+        return list(self._menus)
 
 
 class Ingredients:
@@ -222,38 +489,72 @@ class Ingredients:
         "Z" : "Wt",
     }
 
+    # special parser/ingredient translations; all other locations use the "Studentenwerk" ingredients
+    scheme_lookups = {
+        "fmi-bistro": fmi_ingredient_lookup,
+        "mediziner-mensa": mediziner_ingredient_lookup,
+    }
+
+    unknown_codes = Counter()
+    """Counts the unknown ingredient codes found per (location, code) since the start of the process."""
+    _unknown_codes_lock = threading.Lock()
+
     def __init__(self, location: str) -> None:
         self.location = location
-        self.ingredient_set = set()
+        self.ingredient_set = IngredientSet()
 
-    def _values_lookup(self, values: Sequence[str], lookup: Optional[Dict[str, str]]) -> None:
+    def get_scheme(self) -> str:
+        """Returns the name of the ingredient codes used by the location."""
+        # "ipp-bistro" also uses the "Studentenwerk" ingredients since all dishes contain the same ingredients
+        return self.location if self.location in self.scheme_lookups else "studentenwerk"
+
+    @staticmethod
+    def _values_lookup(values: Sequence[str], lookup: Optional[Dict[str, str]], codes: list, unknown: list) -> None:
         """
         Normalizes ingredients to the self.ingredient_lookup codes.
 
         Args:
             values: A sequence of ingredients codes.
             lookup: If needed, a mapping from a canteen specific ingredients codes to the self.ingredient_lookup codes.
+            codes: The list the normalized codes are appended to.
+            unknown: The list unknown values are appended to.
         """
         for value in values:
             # ignore empty values
             if not value or value.isspace():
                 continue
-            if (not lookup and value not in self.ingredient_lookup) or (lookup and value not in lookup):
+            if (not lookup and value not in Ingredients.ingredient_lookup) or (lookup and value not in lookup):
 
                 # sometimes the ‘,’ is missing between the ingredients (especially with IPP) and we try to split again
                 # with capital letters.
                 split_values = re.findall(r'[a-züöäA-ZÜÖÄ][^A-ZÜÖÄ]*', value)
-                if split_values:
-                    self._values_lookup(split_values, lookup)
+                # a value which cannot be split any further is unknown (and would recurse forever)
+                if split_values and split_values != [value]:
+                    Ingredients._values_lookup(split_values, lookup, codes, unknown)
                     continue
                 else:
-                    print("Unknown ingredient for " + self.location + " found: " + str(value))
+                    unknown.append(value)
                     continue
 
             if lookup:
-                self.ingredient_set.add(lookup[value])
+                codes.append(lookup[value])
             else:
-                self.ingredient_set.add(value)
+                codes.append(value)
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def parse_cached(scheme: str, values: str) -> Tuple["IngredientSet", Tuple[str, ...]]:
+        """
+        Parses a string of comma separated ingredient codes of a scheme (see `get_scheme`). The result is cached,
+        since the same strings occur over and over again.
+
+        Returns:
+            The normalized ingredients and the unknown codes.
+        """
+        codes = []
+        unknown = []
+        Ingredients._values_lookup(values.strip().split(','), Ingredients.scheme_lookups.get(scheme), codes, unknown)
+        return IngredientSet(codes), tuple(unknown)
 
     def parse_ingredients(self, values: str) -> None:
         """
@@ -262,18 +563,23 @@ class Ingredients:
         Args:
             values: String with comma separated ingredients codes.
         """
-        values = values.strip()
-        split_values = values.split(',')
-        # check for special parser/ingredient translation required
-        if self.location == "fmi-bistro":
-            self._values_lookup(split_values, self.fmi_ingredient_lookup)
-        elif self.location == "mediziner-mensa":
-            self._values_lookup(split_values, self.mediziner_ingredient_lookup)
-        # default to the "Studentenwerk" ingredients
-        # "ipp-bistro" also uses the "Studentenwerk" ingredients since all
-        # dishes contain the same ingredients
-        else:
-            self._values_lookup(split_values, None)
+        ingredients, unknown = self.parse_cached(self.get_scheme(), values)
+        self.ingredient_set = self.ingredient_set | ingredients
+        if unknown:
+            with self._unknown_codes_lock:
+                self.unknown_codes.update((self.location, code) for code in unknown)
+
+    @classmethod
+    def pop_unknown_codes(cls) -> Dict[Tuple[str, str], int]:
+        """Returns and resets the counters of unknown ingredient codes."""
+        with cls._unknown_codes_lock:
+            unknown_codes = dict(cls.unknown_codes)
+            cls.unknown_codes.clear()
+        return unknown_codes
 
     def __hash__(self):
-        return hash(frozenset(self.ingredient_set))
+        return hash(self.ingredient_set)
+
+
+ingredient_registry = IngredientRegistry(Ingredients.ingredient_lookup)
+"""The registry of all ingredient codes used by `IngredientSet`."""
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import os
+from typing import Dict, Iterator, List
+
+import util
+
+
+class HistoryStore:
+    """
+    Persistent, append-only history of the menus of a single location.
+
+    Every day is stored as one JSON line `{"date": ..., "year": ..., "week": ..., "dishes": [...]}` (with the ISO
+    year and week) in segment files of about `segment_size` bytes. `index.json` maps every date to the segment and
+    offset of its latest record and to the digest of its dishes. Merging newly parsed weeks only appends the days
+    which are new or have changed, so a run costs time proportional to the new data. Superseded records are dropped
+    by `compact`, which runs automatically once they outnumber the current ones.
+    """
+
+    index_name = "index.json"
+
+    def __init__(self, directory: str, segment_size: int = 4 * 1024 * 1024) -> None:
+        """
+        Args:
+            directory: The directory of the history of the location.
+            segment_size: The size in bytes after which a new segment is started.
+        """
+        self.directory = directory
+        self.segment_size = segment_size
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with open(os.path.join(directory, self.index_name), "r", encoding="utf-8") as index_file:
+                index = json.load(index_file)
+        except FileNotFoundError:
+            index = {"next_segment": 0, "segments": [], "records": 0, "days": {}}
+        self.next_segment = index["next_segment"]
+        self.segments = index["segments"]
+        # the number of records in all segments, including superseded ones
+        self.records = index["records"]
+        # maps the date of every day to [segment, offset, digest] of its latest record
+        self.days = index["days"]
+
+    def __len__(self):
+        return len(self.days)
+
+    def merge(self, weeks) -> int:
+        """
+        Appends all days of `weeks` (a mapping to `Week` objects, e.g. a `CalendarIndex`) which are not yet part of
+        the history or whose dishes have changed.
+
+        Returns:
+            The number of appended days.
+        """
+        records = []
+        for week in weeks.values():
+            for menu in week.days:
+                date = str(menu.menu_date)
+                dishes = encode([dish.to_json_obj() for dish in menu.dishes])
+                digest = hashlib.sha256(dishes.encode("utf-8")).hexdigest()[:32]
+                if date in self.days and self.days[date][2] == digest:
+                    continue
+                # the dishes are already encoded, so the record is assembled as string
+                records.append((date, digest, '{"date":"%s","year":%d,"week":%d,"dishes":%s}' % (
+                    date, week.year, week.calendar_week, dishes)))
+        if not records:
+            return 0
+
+        self.append(records, reuse_last_segment=True)
+        if self.records - len(self.days) > len(self.days):
+            self.compact()
+        return len(records)
+
+    def append(self, records, reuse_last_segment: bool) -> None:
+        # the index is written after the records, so it never points to a missing record
+        segment_file = None
+        try:
+            if reuse_last_segment and self.segments:
+                segment_file = open(self.get_path(self.segments[-1]), "ab")
+            for date, digest, line in records:
+                if segment_file is None or segment_file.tell() >= self.segment_size:
+                    if segment_file is not None:
+                        segment_file.close()
+                    segment_file = self.new_segment()
+                self.days[date] = [self.segments[-1], segment_file.tell(), digest]
+                segment_file.write(line.encode("utf-8") + b"\n")
+            segment_file.flush()
+            os.fsync(segment_file.fileno())
+        finally:
+            if segment_file is not None:
+                segment_file.close()
+        self.records += len(records)
+        self.write_index()
+
+    def new_segment(self):
+        # segment names are never reused, so compacting never overwrites a segment which is still referenced
+        segment = "segment-%06d.jsonl" % self.next_segment
+        self.next_segment += 1
+        self.segments.append(segment)
+        return open(self.get_path(segment), "wb")
+
+    def get_path(self, segment: str) -> str:
+        return os.path.join(self.directory, segment)
+
+    def write_index(self) -> None:
+        util.atomic_write(os.path.join(self.directory, self.index_name), encode(
+            {"next_segment": self.next_segment, "segments": self.segments, "records": self.records,
+             "days": self.days}).encode("utf-8"))
+
+    def read_lines(self) -> Dict[str, str]:
+        # read every segment once, in the order of the offsets
+        offsets = {segment: [] for segment in self.segments}
+        for date, (segment, offset, _) in self.days.items():
+            offsets[segment].append((offset, date))
+        lines = {}
+        for segment in self.segments:
+            if not offsets[segment]:
+                continue
+            with open(self.get_path(segment), "rb") as segment_file:
+                for offset, date in sorted(offsets[segment]):
+                    segment_file.seek(offset)
+                    lines[date] = segment_file.readline().decode("utf-8").rstrip("\n")
+        return lines
+
+    def iter_days(self) -> Iterator[dict]:
+        """Yields the latest record of every day, sorted by date."""
+        lines = self.read_lines()
+        for date in sorted(lines):
+            yield json.loads(lines[date])
+
+    def compact(self) -> None:
+        """Rewrites the history without superseded records."""
+        lines = self.read_lines()
+        old_segments = self.segments
+        self.segments = []
+        self.records = 0
+        self.append([(date, self.days[date][2], lines[date]) for date in sorted(lines)], reuse_last_segment=False)
+        for segment in old_segments:
+            os.unlink(self.get_path(segment))
+
+    def to_json_obj(self, location: str) -> dict:
+        """Returns the whole history in the format of `combined.json`."""
+        weeks = []  # type: List[dict]
+        for record in self.iter_days():
+            if not weeks or (weeks[-1]["year"], weeks[-1]["number"]) != (record["year"], record["week"]):
+                weeks.append({"number": record["week"], "year": record["year"], "days": []})
+            weeks[-1]["days"].append({"date": record["date"], "dishes": record["dishes"]})
+        return {"canteen_id": location, "weeks": weeks}
+
+
+def encode(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
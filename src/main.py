@@ -1,36 +1,57 @@
 # -*- coding: utf-8 -*-
-import json
+import asyncio
 import os
 
+import batch
 import cli
 import menu_parser
 
 import util
+from archive import MenuArchive
 from openmensa import openmensa
-from entities import Week
+from output import AtomicOutput, JsonWriter
+from entities import CalendarIndex, Ingredients
+from history import HistoryStore
+from menu_cache import MenuCache
+from pdf import PdfTextCache, PdfTextExtractor
+from snapshot import write_snapshot
+from transport import CachingTransport, RecordingTransport, ReplayTransport, Transport
 
 
-def get_menu_parsing_strategy(location):
+def get_menu_parsing_strategy(location, **options):
+    """Returns the parser for `location`; `options` (e.g. a shared transport) are passed to its constructor."""
     parser = None
 
     # set parsing strategy based on location
     if isinstance(location, int) or location in menu_parser.StudentenwerkMenuParser.location_id_mapping.keys():
-        parser = menu_parser.StudentenwerkMenuParser()
+        parser = menu_parser.StudentenwerkMenuParser(**options)
     elif location == "fmi-bistro":
-        parser = menu_parser.FMIBistroMenuParser()
+        parser = menu_parser.FMIBistroMenuParser(**options)
     elif location == "ipp-bistro":
-        parser = menu_parser.IPPBistroMenuParser()
+        parser = menu_parser.IPPBistroMenuParser(**options)
     elif location == "mediziner-mensa":
-        parser = menu_parser.MedizinerMensaMenuParser()
+        parser = menu_parser.MedizinerMensaMenuParser(**options)
 
     return parser
 
 
-def jsonify(weeks, directory, location, combine_dishes):
+def jsonify(weeks, directory, location, combine_dishes, writer=None, history=None):
+    """
+    Writes one JSON file per week and optionally a combined file of all weeks.
+
+    Args:
+        weeks: A mapping to the `Week` objects to write, e.g. a `CalendarIndex`.
+        directory: The output directory.
+        location: The location the menus belong to.
+        combine_dishes: Whether to write `combined/combined.json` as well.
+        writer: The `output.JsonWriter` to use; defaults to indented output.
+        history: The `history.HistoryStore` of the location; if given, `weeks` are merged into it and the combined
+            file contains all weeks of the history.
+    """
+    if writer is None:
+        writer = JsonWriter()
     # iterate through weeks
-    for calendar_week in weeks:
-        # get Week object
-        week = weeks[calendar_week]
+    for week in weeks.values():
         # get year of calendar week
         year = week.year
 
@@ -39,11 +60,11 @@ def jsonify(weeks, directory, location, combine_dishes):
         if not os.path.exists(json_dir):
             os.makedirs("%s/%s" % (str(directory), str(year)))
 
-        # convert Week object to JSON
-        week_json = week.to_json()
         # write JSON to file: <year>/<calendar_week>.json
-        with open("%s/%s.json" % (str(json_dir), str(calendar_week).zfill(2)), 'w') as outfile:
-            json.dump(json.loads(week_json), outfile, indent=4, ensure_ascii=False)
+        writer.write("%s/%s.json" % (str(json_dir), str(week.calendar_week).zfill(2)), week.to_json_obj())
+
+    # only new or changed days are appended to the history
+    appended = history.merge(weeks) if history is not None else 0
 
     # check if combine parameter got set
     if not combine_dishes:
@@ -56,29 +77,157 @@ def jsonify(weeks, directory, location, combine_dishes):
     if not os.path.exists(json_dir):
         os.makedirs("%s/%s" % (str(directory), combined_df_name))
 
-    # convert all weeks to one JSON object
-    weeks_json_all = json.dumps(
-        {"canteen_id": location, "weeks": [weeks[calendar_week].to_json_obj() for calendar_week in weeks]}, 
-        ensure_ascii=False, indent=4)
-    
-    # write JSON object to file
-    with open("%s/%s.json" % (str(json_dir), combined_df_name), 'w') as outfile:
-        json.dump(json.loads(weeks_json_all), outfile, indent=4, ensure_ascii=False)
+    combined_path = "%s/%s.json" % (str(json_dir), combined_df_name)
+    if history is None:
+        # write all weeks as one JSON object to file
+        writer.write(combined_path, {"canteen_id": location, "weeks": [week.to_json_obj() for week in weeks.values()]})
+    elif appended > 0 or not os.path.exists(combined_path):
+        # the combined file is only exported again if the history changed
+        writer.write(combined_path, history.to_json_obj(location))
+    elif writer.output.precompress:
+        # the file is unchanged, but it may have been written by a run without precompression
+        writer.output.compress(combined_path, only_stale=True)
+
+
+def get_transport(args):
+    # recorded responses make runs reproducible without any network access
+    if args.replay is not None:
+        return ReplayTransport(args.replay)
+    transport = Transport(pool_size=args.pool_size, max_per_host=args.max_per_host, timeout=args.timeout)
+    if args.cache_dir is not None:
+        transport = CachingTransport(transport, os.path.join(args.cache_dir, "http"), args.max_age)
+    if args.record is not None:
+        transport = RecordingTransport(transport, args.record)
+    return transport
+
+
+def get_pdf_extractor(args):
+    cache = None
+    if args.cache_dir is not None:
+        cache = PdfTextCache(os.path.join(args.cache_dir, "pdftext"), args.pdf_cache_size * 1024 * 1024)
+    return PdfTextExtractor(timeout=args.pdftotext_timeout, max_workers=args.pdftotext_jobs, cache=cache)
+
+
+def get_menu_cache(args):
+    if args.cache_dir is None:
+        return None
+    return MenuCache(os.path.join(args.cache_dir, "menus"))
+
+
+def get_history(args, location):
+    if args.history is None:
+        return None
+    return HistoryStore(os.path.join(args.history, location))
+
+
+def get_parser_options(args):
+    # all parsers share the same transport, pdf extractor and menu cache
+    return {"transport": get_transport(args), "pdf_extractor": get_pdf_extractor(args),
+            "menu_cache": get_menu_cache(args), "pdf_workers": args.pdf_workers, "streaming": args.stream}
+
+
+def parse_locations_async(args, parser_options):
+    # aiohttp is only imported if it is actually needed
+    from async_transport import AsyncTransport
+
+    async def parse_all():
+        async with AsyncTransport(args.pool_size, args.max_per_host, args.timeout) as client:
+            return await batch.parse_locations_async(
+                args.location, lambda location: get_menu_parsing_strategy(location, **parser_options), client)
+
+    return run_async(parse_all())
+
+
+def run_async(coroutine):
+    """Runs `coroutine` on a new event loop and returns its result."""
+    loop = asyncio.new_event_loop()
+    # before Python 3.8 the child watcher of asyncio subprocesses (pdftotext) is only attached to the current loop
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+def print_unknown_ingredients():
+    # unknown ingredient codes are reported once per code instead of once per dish
+    for (location, code), count in sorted(Ingredients.pop_unknown_codes().items()):
+        print("Unknown ingredient for %s found: %s (%d times)" % (location, code, count))
+
+
+def process_batch(args, parser_options):
+    # parse all locations concurrently; all parsers share the same connection pools, pdftotext slots and caches
+    if args.asyncio:
+        results = parse_locations_async(args, parser_options)
+    else:
+        results = batch.parse_locations(
+            args.location, lambda location: get_menu_parsing_strategy(location, **parser_options), args.workers)
+
+    # write the output of every location into its own subdirectory; unchanged files are not rewritten
+    output = AtomicOutput(args.precompress, args.compress_level)
+    for result in results:
+        if result.ok:
+            weeks = CalendarIndex(result.menus)
+            if args.jsonify is not None:
+                json_dir = os.path.join(args.jsonify, result.location)
+                if not os.path.exists(json_dir):
+                    os.makedirs(json_dir)
+                jsonify(weeks, json_dir, result.location, args.combine, JsonWriter(args.compact, output=output),
+                        get_history(args, result.location))
+            if args.openmensa is not None:
+                openmensa_dir = os.path.join(args.openmensa, result.location)
+                if not os.path.exists(openmensa_dir):
+                    os.makedirs(openmensa_dir)
+                openmensa(weeks, openmensa_dir, output)
+        print(result)
+    if args.snapshot is not None:
+        # a single snapshot file contains all locations
+        write_snapshot(args.snapshot, {result.location: result.menus for result in results if result.ok}, output)
+
+    num_ok = len([result for result in results if result.ok])
+    print("%d of %d locations parsed successfully." % (num_ok, len(results)))
+    print_unknown_ingredients()
+    print(output)
+    if args.archive is not None:
+        # all locations are archived in a single transaction
+        with MenuArchive(args.archive) as archive:
+            archive.write({result.location: result.menus for result in results if result.ok})
+            print(archive)
+    if parser_options["pdf_extractor"].cache is not None:
+        print(parser_options["pdf_extractor"].cache)
+    if parser_options["menu_cache"] is not None:
+        print(parser_options["menu_cache"])
 
 
 def main():
     # get command line args
     args = cli.parse_cli_args()
 
+    parser_options = get_parser_options(args)
+    # more than one location: parse all of them in one process
+    if len(args.location) > 1:
+        process_batch(args, parser_options)
+        return
+
     # get location from args
-    location = args.location
+    location = args.location[0]
     # get required parser
-    parser = get_menu_parsing_strategy(location)
+    parser = get_menu_parsing_strategy(location, **parser_options)
     if parser is None:
         print("The selected location '%s' does not exist." % location)
 
     # parse menu
     menus = parser.parse(location)
+    print_unknown_ingredients()
+    if menus is not None and args.archive is not None:
+        with MenuArchive(args.archive) as archive:
+            archive.write({location: menus})
+            print(archive)
+    if menus is not None and args.snapshot is not None:
+        snapshot_output = AtomicOutput()
+        write_snapshot(args.snapshot, {location: menus}, snapshot_output)
+        print(snapshot_output)
 
     # if date has been explicitly specified, try to parse it
     menu_date = None
@@ -90,32 +239,35 @@ def main():
             print("Required format: %s" % util.cli_date_format)
             return
 
+    # unchanged output files are not rewritten
+    output = AtomicOutput(args.precompress, args.compress_level)
     # print menu
     if menus is None:
         print("Error. Could not retrieve menu(s)")
-    # jsonify argument is set
-    elif args.jsonify is not None:
-        weeks = Week.to_weeks(menus)
-        if not os.path.exists(args.jsonify):
-            os.makedirs(args.jsonify)
-        jsonify(weeks, args.jsonify, location, args.combine)
-    elif args.openmensa is not None:
-        weeks = Week.to_weeks(menus)
-        if not os.path.exists(args.openmensa):
-            os.makedirs(args.openmensa)
-        openmensa(weeks, args.openmensa)
+    # jsonify and/or openmensa argument is set
+    elif args.jsonify is not None or args.openmensa is not None:
+        weeks = CalendarIndex(menus)
+        if args.jsonify is not None:
+            if not os.path.exists(args.jsonify):
+                os.makedirs(args.jsonify)
+            jsonify(weeks, args.jsonify, location, args.combine, JsonWriter(args.compact, output=output),
+                    get_history(args, location))
+        if args.openmensa is not None:
+            if not os.path.exists(args.openmensa):
+                os.makedirs(args.openmensa)
+            openmensa(weeks, args.openmensa, output)
+        print(output)
     # date argument is set
     elif args.date is not None:
-        if menu_date not in menus:
+        menu = CalendarIndex(menus).menu(menu_date)
+        if menu is None:
             print("There is no menu for '%s' on %s!" % (location, menu_date))
             return
-        menu = menus[menu_date]
         print(menu)
     # else, print weeks
     else:
-        weeks = Week.to_weeks(menus)
-        for calendar_week in weeks:
-            print(weeks[calendar_week])
+        for week in CalendarIndex(menus).values():
+            print(week)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+import glob
+import hashlib
+import os
+import pickle
+import shutil
+import threading
+import zlib
+from functools import lru_cache
+from typing import Callable, Optional
+
+import util
+
+
+@lru_cache(maxsize=1)
+def get_code_version() -> str:
+    """
+    Returns a digest of the source code of all modules in this directory. Any change of the parsers or entities
+    results in a new version, which invalidates all cached parse results.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py"))):
+        with open(path, "rb") as source:
+            digest.update(os.path.basename(path).encode("utf-8") + b"\0" + source.read())
+    return digest.hexdigest()
+
+
+class MenuCache:
+    """
+    On-disk memoization of `get_menus`.
+
+    Entries are keyed by the parser class, the code version, the digest of the parser input (the HTML page or the
+    extracted PDF text) and the location (plus further parser arguments like year and week number). The parsed
+    menus are stored as compressed pickles, so unchanged input does not have to be parsed again. The entries of every
+    code version are kept in their own subdirectory; the entries of all other versions can never be hit again and
+    are deleted when the cache is opened.
+    """
+
+    def __init__(self, directory: str, version: Optional[str] = None) -> None:
+        """
+        Args:
+            directory: The directory the parse results are stored in.
+            version: The version of the parser code; defaults to `get_code_version()`.
+        """
+        self.version = version if version is not None else get_code_version()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        version_name = hashlib.sha256(self.version.encode("utf-8")).hexdigest()[:16]
+        self.directory = os.path.join(directory, version_name)
+        os.makedirs(self.directory, exist_ok=True)
+        self._prune(directory, version_name)
+
+    @staticmethod
+    def _prune(directory: str, version_name: str) -> None:
+        # remove the entries of other code versions (and of the layout without version subdirectories)
+        for entry in os.scandir(directory):
+            if entry.name == version_name:
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path, ignore_errors=True)
+            elif entry.name.endswith(".pickle.z"):
+                try:
+                    os.unlink(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def get_key(self, parser, data: bytes, *args) -> str:
+        digest = hashlib.sha256(data)
+        digest.update(repr((type(parser).__qualname__, self.version) + args).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get_menus(self, parser, data: bytes, get_menus: Callable, *args):
+        """
+        Returns the cached result of `get_menus()` for this input or calls it and caches its result.
+
+        Args:
+            parser: The parser `get_menus` belongs to.
+            data: The raw input of the parser.
+            get_menus: A callable that parses `data`.
+            args: Further arguments the result depends on (e.g. location, year and week number).
+        """
+        path = os.path.join(self.directory, self.get_key(parser, data, *args) + ".pickle.z")
+        try:
+            with open(path, "rb") as entry:
+                menus = pickle.loads(zlib.decompress(entry.read()))
+        except (OSError, zlib.error, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            pass
+        else:
+            with self._lock:
+                self.hits += 1
+            return menus
+
+        with self._lock:
+            self.misses += 1
+        menus = get_menus()
+        util.atomic_write(path, zlib.compress(pickle.dumps(menus, pickle.HIGHEST_PROTOCOL)))
+        return menus
+
+    def __repr__(self):
+        return "menu cache: %d hits, %d misses" % (self.hits, self.misses)
@@ -1,23 +1,51 @@
 # -*- coding: utf-8 -*-
 
+import asyncio
 import re
 import sys
-import tempfile
 import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from subprocess import call
 from warnings import warn
 
-import requests
-from lxml import html
+from lxml import etree, html
 
 import util
-from entities import Dish, Menu, Ingredients
+from columns import ColumnLayout
+from entities import Dish, Menu
+from pdf import PdfTextExtractor
+from transport import Transport
 
 
 class MenuParser:
     # we use datetime %u, so we go from 1-7
     weekday_positions = {"mon": 1, "tue": 2, "wed": 3, "thu": 4, "fri": 5, "sat": 6, "sun": 7}
+    # the last page of menu PDFs which is converted to text; None converts all pages
+    pdf_last_page = None
+
+    def __init__(self, transport=None, pdf_extractor=None, menu_cache=None, pdf_workers=4, streaming=False):
+        # all web pages and PDFs are downloaded through the (possibly shared) transport
+        self.transport = transport if transport is not None else Transport()
+        # PDF menus are converted to text by the (possibly shared) extractor
+        self.pdf_extractor = pdf_extractor if pdf_extractor is not None else PdfTextExtractor()
+        # optional MenuCache; if set, unchanged input is not parsed again
+        self.menu_cache = menu_cache
+        # number of weekly PDFs downloaded and parsed in parallel
+        self.pdf_workers = pdf_workers
+        # parse HTML pages incrementally while they are downloaded (if supported by the parser)
+        self.streaming = streaming
+
+    def get_menus_cached(self, data, get_menus, *args):
+        """
+        Returns `get_menus()`, using the menu cache (if any) for the input `data` and the further arguments `args`
+        (e.g. location, year and week number) the result depends on.
+        """
+        if self.menu_cache is None:
+            return get_menus()
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        return self.menu_cache.get_menus(self, data, get_menus, *args)
 
     @staticmethod
     def get_date(year, week_number, day):
@@ -31,9 +59,95 @@ class MenuParser:
 
         return date
 
+    def parse_pdf(self, pdf, location):
+        """Downloads, converts and parses a single PDF menu given as (pdf_url, year, week_number) tuple."""
+        pdf_url, year, week_number = pdf
+        # download pdf and convert it to text
+        data = self.pdf_extractor.extract(self.transport.fetch(pdf_url), last_page=self.pdf_last_page)
+        return self.get_menus_cached(data, lambda: self.get_menus(data, year, week_number),
+                                     location, year, week_number)
+
+    async def parse_pdf_async(self, pdf, location, client):
+        """Like `parse_pdf`, but downloads the PDF with the async `client` and runs `pdftotext` asynchronously."""
+        pdf_url, year, week_number = pdf
+        data = await self.pdf_extractor.extract_async(await client.fetch(pdf_url), last_page=self.pdf_last_page)
+        return self.get_menus_cached(data, lambda: self.get_menus(data, year, week_number),
+                                     location, year, week_number)
+
+    def parse_pdf_menus(self, pdfs, location):
+        """
+        Downloads, converts and parses several weekly PDF menus in parallel.
+
+        Args:
+            pdfs: A list of (pdf_url, year, week_number) tuples.
+            location: The location the PDFs belong to.
+
+        Returns:
+            The menus of all PDFs merged in the order of `pdfs`.
+        """
+        with ThreadPoolExecutor(max_workers=self.pdf_workers) as executor:
+            parsed_menus_list = list(executor.map(lambda pdf: self.parse_pdf(pdf, location), pdfs))
+        return self.merge_menus(parsed_menus_list)
+
+    async def parse_pdf_menus_async(self, pdfs, location, client):
+        """Like `parse_pdf_menus`, but all PDFs are processed concurrently on the running event loop."""
+        parsed_menus_list = await asyncio.gather(*[self.parse_pdf_async(pdf, location, client) for pdf in pdfs])
+        return self.merge_menus(parsed_menus_list)
+
+    @staticmethod
+    def merge_menus(parsed_menus_list):
+        # merge in a deterministic order; later weeks overwrite earlier ones like in a sequential run
+        menus = {}
+        for parsed_menus in parsed_menus_list:
+            if parsed_menus is not None:
+                menus.update(parsed_menus)
+        return menus
+
+    def get_fetch_key(self, location):
+        """
+        Returns a key identifying the source the menus of `location` are scraped from. Locations with the same key
+        share their menus, so they only need to be fetched and parsed once.
+        """
+        return type(self).__name__, location
+
     def parse(self, location):
         pass
 
+    async def parse_async(self, location, client):
+        """
+        Non-blocking counterpart of `parse`: all downloads go through the async `client` (e.g. an
+        `async_transport.AsyncTransport`) and `pdftotext` runs as asyncio subprocess.
+        """
+        pass
+
+
+location_cities = {
+    "fmi-bistro": "Garching",
+    "ipp-bistro": "Garching",
+    "mediziner-mensa": "München",
+    "mensa-arcisstr": "München",
+    "mensa-arcisstrasse": "München",
+    "mensa-garching": "Garching",
+    "mensa-leopoldstr": "München",
+    "mensa-lothstr": "München",
+    "mensa-martinsried": "Planegg-Martinsried",
+    "mensa-pasing": "München",
+    "mensa-weihenstephan": "Freising",
+    "stubistro-arcisstr": "München",
+    "stubistro-goethestr": "München",
+    "stubistro-großhadern": "München",
+    "stubistro-grosshadern": "München",
+    "stubistro-rosenheim": "Rosenheim",
+    "stubistro-schellingstr": "München",
+    "stucafe-adalbertstr": "München",
+    "stucafe-akademie-weihenstephan": "Freising",
+    "stucafe-boltzmannstr": "Garching",
+    "stucafe-garching": "Garching",
+    "stucafe-karlstr": "München",
+    "stucafe-pasing": "München",
+}
+"""Maps every location to the city (or campus) it is located in, as listed in the README."""
+
 
 class StudentenwerkMenuParser(MenuParser):
     prices = {
@@ -83,73 +197,144 @@ class StudentenwerkMenuParser(MenuParser):
 
     base_url = "http://www.studentenwerk-muenchen.de/mensa/speiseplan/speiseplan_{}_-de.html"
 
-    def parse(self, location):
-        """`location` can be either the numeric location id or its string alias as defined in `location_id_mapping`"""
+    def get_location_id(self, location):
+        """
+        `location` can be either the numeric location id or its string alias as defined in `location_id_mapping`.
+        Returns None if the location does not exist.
+        """
         try:
-            location_id = int(location)
+            return int(location)
         except ValueError:
-            try:
-                location_id = self.location_id_mapping[location]
-            except KeyError:
-                print("Location {} not found. Choose one of {}.".format(
-                    location, ', '.join(self.location_id_mapping.keys())), sys.stderr)
-                return None
+            return self.location_id_mapping.get(location)
+
+    def get_fetch_key(self, location):
+        # aliases (e.g. "mensa-arcisstr" and "mensa-arcisstrasse") share the same page
+        location_id = self.get_location_id(location)
+        if location_id is None:
+            return super().get_fetch_key(location)
+        return self.base_url.format(location_id)
+
+    def get_page_link(self, location):
+        location_id = self.get_location_id(location)
+        if location_id is None:
+            print("Location {} not found. Choose one of {}.".format(
+                location, ', '.join(self.location_id_mapping.keys())), sys.stderr)
+            return None
+        return self.base_url.format(location_id)
 
-        page_link = self.base_url.format(location_id)
+    def parse(self, location):
+        """`location` can be either the numeric location id or its string alias as defined in `location_id_mapping`"""
+        page_link = self.get_page_link(location)
+        if page_link is None:
+            return None
 
-        page = requests.get(page_link)
-        tree = html.fromstring(page.content)
-        return self.get_menus(tree, location)
+        if self.streaming:
+            return {menu.menu_date: menu for menu in self.stream_menus(location)}
+
+        page = self.transport.fetch(page_link)
+        return self.parse_page(page, location)
+
+    async def parse_async(self, location, client):
+        page_link = self.get_page_link(location)
+        if page_link is None:
+            return None
+
+        page = await client.fetch(page_link)
+        return self.parse_page(page, location)
+
+    def parse_page(self, page, location):
+        return self.get_menus_cached(page, lambda: self.get_menus(html.fromstring(page), location), location)
+
+    # all queries are compiled once and evaluated relative to a single daily menu of the page
+    daily_menus_xpath = etree.XPath("//div[@class='c-schedule__item']")
+    menu_date_xpath = etree.XPath(".//strong/text()")
+    dish_names_xpath = etree.XPath(".//p[@class='js-schedule-dish-description']/text()")
+    dish_types_xpath = etree.XPath(".//span[@class='stwm-artname']")
+    dish_markers_additional_xpath = etree.XPath(
+        ".//span[contains(@class, 'c-schedule__marker--additional')]/@data-essen")
+    dish_markers_allergen_xpath = etree.XPath(".//span[contains(@class, 'c-schedule__marker--allergen')]/@data-essen")
+    dish_markers_type_xpath = etree.XPath(".//span[contains(@class, 'c-schedule__marker--type')]/@data-essen")
 
     def get_menus(self, page, location):
         # initialize empty dictionary
         menus = {}
         # convert passed date to string
         # get all available daily menus
-        daily_menus = self.__get_daily_menus_as_html(page)
+        daily_menus = self.daily_menus_xpath(page)
 
-        # iterate through daily menus
+        # iterate through daily menus; each of them is queried in place, without serializing and re-parsing it
         for daily_menu in daily_menus:
-            # get html representation of current menu
-            menu_html = html.fromstring(html.tostring(daily_menu))
-            # get the date of the current menu; some string modifications are necessary
-            current_menu_date_str = menu_html.xpath("//strong/text()")[0]
-            # parse date
-            try:
-                current_menu_date = util.parse_date(current_menu_date_str)
-            except ValueError as e:
-                print("Warning: Error during parsing date from html page. Problematic date: %s" % current_menu_date_str)
-                # continue and parse subsequent menus
-                continue
-            # parse dishes of current menu
-            dishes = self.__parse_dishes(menu_html, location)
-            # create menu object
-            menu = Menu(current_menu_date, dishes)
-            # add menu object to dictionary using the date as key
-            menus[current_menu_date] = menu
+            menu = self.parse_daily_menu(daily_menu, location)
+            if menu is not None:
+                # add menu object to dictionary using the date as key
+                menus[menu.menu_date] = menu
 
         # return the menu for the requested date; if no menu exists, None is returned
         return menus
 
-    @staticmethod
-    def __get_daily_menus_as_html(page):
-        # obtain all daily menus found in the passed html page by xpath query
-        daily_menus = page.xpath("//div[@class='c-schedule__item']")
-        return daily_menus
-
-    @staticmethod
-    def __parse_dishes(menu_html, location):
+    def parse_daily_menu(self, daily_menu, location):
+        """Returns the `Menu` of a `c-schedule__item` element or None if its date cannot be parsed."""
+        # get the date of the current menu; some string modifications are necessary
+        current_menu_date_str = self.menu_date_xpath(daily_menu)[0]
+        # parse date
+        try:
+            current_menu_date = util.parse_date(current_menu_date_str)
+        except ValueError as e:
+            print("Warning: Error during parsing date from html page. Problematic date: %s" % current_menu_date_str)
+            # continue and parse subsequent menus
+            return None
+        # parse dishes of current menu
+        dishes = self.__parse_dishes(daily_menu, location)
+        # create menu object
+        return Menu(current_menu_date, dishes)
+
+    def stream_menus(self, location, chunk_size=64 * 1024):
+        """
+        Downloads the page of `location` in chunks and yields every daily `Menu` as soon as it has been received.
+        The menu cache is not used, since the whole page would be needed for its key.
+        """
+        page_link = self.get_page_link(location)
+        if page_link is None:
+            return
+        yield from self.iter_menus(self.transport.stream(page_link, chunk_size), location)
+
+    def iter_menus(self, chunks, location):
+        """
+        Parses a page given as iterable of byte chunks incrementally and yields one `Menu` per
+        `c-schedule__item` element as soon as the element is closed. Parsed elements are discarded, so the memory
+        needed does not grow with the size of the page.
+        """
+        parser = etree.HTMLPullParser(events=("end",), tag="div")
+        for chunk in chunks:
+            parser.feed(chunk)
+            yield from self.__pop_menus(parser, location)
+        parser.close()
+        yield from self.__pop_menus(parser, location)
+
+    def __pop_menus(self, parser, location):
+        for _, element in parser.read_events():
+            if element.get("class") != "c-schedule__item":
+                continue
+            menu = self.parse_daily_menu(element, location)
+            # drop the element and all daily menus before it
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+            if menu is not None:
+                yield menu
+
+    @classmethod
+    def __parse_dishes(cls, menu_html, location):
         # obtain the names of all dishes in a passed menu
-        dish_names = [dish.rstrip() for dish in menu_html.xpath("//p[@class='js-schedule-dish-description']/text()")]
+        dish_names = [dish.rstrip() for dish in cls.dish_names_xpath(menu_html)]
         # make duplicates unique by adding (2), (3) etc. to the names
         dish_names = util.make_duplicates_unique(dish_names)
         # obtain the types of the dishes (e.g. 'Tagesgericht 1')
-        dish_types = [type.text if type.text else '' for type in menu_html.xpath("//span[@class='stwm-artname']")]
+        dish_types = [type.text if type.text else '' for type in cls.dish_types_xpath(menu_html)]
         # obtain all ingredients
-        dish_markers_additional = menu_html.xpath(
-            "//span[contains(@class, 'c-schedule__marker--additional')]/@data-essen")
-        dish_markers_allergen = menu_html.xpath("//span[contains(@class, 'c-schedule__marker--allergen')]/@data-essen")
-        dish_markers_type = menu_html.xpath("//span[contains(@class, 'c-schedule__marker--type')]/@data-essen")
+        dish_markers_additional = cls.dish_markers_additional_xpath(menu_html)
+        dish_markers_allergen = cls.dish_markers_allergen_xpath(menu_html)
+        dish_markers_type = cls.dish_markers_type_xpath(menu_html)
 
         # create dictionary out of dish name and dish type
         dishes_dict = {}
@@ -164,14 +349,11 @@ class StudentenwerkMenuParser(MenuParser):
                 # some dishes are multi-row. That means that for the same type the dish is written in multiple rows.
                 # From the second row on the type is then just empty. In that case, we just use the price and
                 # ingredients of the previous dish.
-                dishes.append(Dish(name, dishes[-1].price, dishes[-1].ingredients, dishes[-1].dish_type))
+                dishes.append(dishes[-1].replace(name=name))
             else:
-                dish_ingredients = Ingredients(location)
-                dish_ingredients.parse_ingredients(dishes_dict[name][1])
-                dish_ingredients.parse_ingredients(dishes_dict[name][2])
-                dish_ingredients.parse_ingredients(dishes_dict[name][3])
-                dishes.append(Dish(name, StudentenwerkMenuParser.prices.get(dishes_dict[name][0], "N/A"),
-                                   dish_ingredients.ingredient_set, dishes_dict[name][0]))
+                dish_type, *markers = dishes_dict[name]
+                dishes.append(Dish.from_markers(name, StudentenwerkMenuParser.prices.get(dish_type, "N/A"), location,
+                                                markers, dish_type))
 
         return dishes
 
@@ -183,48 +365,46 @@ class FMIBistroMenuParser(MenuParser):
     allergens_regex = r"(Allergene:((\s|\n)*(Gluten|Laktose|Milcheiweiß|Hühnerei|Soja|Nüsse|Erdnuss|Sellerie|Fisch|Krebstiere|Weichtiere|Sesam|Senf|Milch|Ei),?(?![\w-]))*)"
     price_regex = r"\€\s\d+,\d+"
     dish_regex = r".+?\€\s\d+,\d+"
+    # the table header: one column per weekday
+    weekdays = OrderedDict([("mon", "Montag"), ("tue", "Dienstag"), ("wed", "Mittwoch"), ("thu", "Donnerstag"),
+                            ("fri", "Freitag")])
 
     def parse(self, location):
         # get web page of bistro
-        page = requests.get(self.url)
+        pdfs = self.get_pdfs(self.transport.fetch(self.url))
+        if len(pdfs) < 1:
+            return None
+        return self.parse_pdf_menus(pdfs, location)
+
+    async def parse_async(self, location, client):
+        pdfs = self.get_pdfs(await client.fetch(self.url))
+        if len(pdfs) < 1:
+            return None
+        return await self.parse_pdf_menus_async(pdfs, location, client)
+
+    def get_pdfs(self, page):
         # get html tree
-        tree = html.fromstring(page.content)
+        tree = html.fromstring(page)
         # get url of current pdf menu
         xpath_query = tree.xpath("//a[contains(@href, 'Garching-KW')]/@href")
+        return [(pdf_url,) + self.get_year_and_week_number(pdf_url) for pdf_url in xpath_query]
 
-        if len(xpath_query) < 1:
-            return None
+    @staticmethod
+    def get_year_and_week_number(pdf_url):
+        # Example PDF-name: Garching-Speiseplan_KW46_2017.pdf
+        # more examples: https://regex101.com/r/ATOHj3/3
+        pdf_name = pdf_url.split("/")[-1]
+        wn_year_match = re.search(r"KW[^a-zA-Z1-9]*([1-9]+\d*)[^a-zA-Z1-9]*([1-9]+\d{3})?", pdf_name, re.IGNORECASE)
+        week_number = int(wn_year_match.group(1)) if wn_year_match else None
+        year = int(wn_year_match.group(2)) if wn_year_match and wn_year_match.group(2) else None
 
-        menus = {}
-        for pdf_url in xpath_query:
-            # Example PDF-name: Garching-Speiseplan_KW46_2017.pdf
-            # more examples: https://regex101.com/r/ATOHj3/3
-            pdf_name = pdf_url.split("/")[-1]
-            wn_year_match = re.search(r"KW[^a-zA-Z1-9]*([1-9]+\d*)[^a-zA-Z1-9]*([1-9]+\d{3})?", pdf_name, re.IGNORECASE)
-            week_number = int(wn_year_match.group(1)) if wn_year_match else None
-            year = int(wn_year_match.group(2)) if wn_year_match and wn_year_match.group(2) else None
-
-            today = datetime.today()
-            # a hacky way to detect when something is appended or prepended to the year (like 20181 for year 2018)
-            # TODO probably replace year abnormality by a better method
-            if (year != today.year and str(today.year) in str(year)) or year is None:
-                year = today.year
-
-            with tempfile.NamedTemporaryFile() as temp_pdf:
-                # download pdf
-                response = requests.get(pdf_url)
-                temp_pdf.write(response.content)
-                with tempfile.NamedTemporaryFile() as temp_txt:
-                    # convert pdf to text by calling pdftotext
-                    call(["pdftotext", "-layout", temp_pdf.name, temp_txt.name])
-                    with open(temp_txt.name, 'r') as myfile:
-                        # read generated text file
-                        data = myfile.read()
-                        parsed_menus = self.get_menus(data, year, week_number)
-                        if parsed_menus is not None:
-                            menus.update(parsed_menus)
+        today = datetime.today()
+        # a hacky way to detect when something is appended or prepended to the year (like 20181 for year 2018)
+        # TODO probably replace year abnormality by a better method
+        if (year != today.year and str(today.year) in str(year)) or year is None:
+            year = today.year
 
-        return menus
+        return year, week_number
 
     def get_menus(self, text, year, week_number):
         menus = {}
@@ -239,21 +419,13 @@ class FMIBistroMenuParser(MenuParser):
 
         lines = lines[count:]
         # we assume that the weeksdays are now all in the first line
-        pos_mon = lines[0].find("Montag")
-        pos_tue = lines[0].find("Dienstag")
-        pos_wed = lines[0].find("Mittwoch")
-        pos_thu = lines[0].find("Donnerstag")
-        pos_fri = lines[0].find("Freitag")
+        layout = ColumnLayout.from_anchors(lines[0], self.weekdays.values())
 
         # The text is formatted as table using whitespaces. Hence, we need to get those parts of each line that refer
         #  to the respective week day
-        lines_weekdays = {"mon": "", "tue": "", "wed": "", "thu": "", "fri": ""}
-        for line in lines:
-            lines_weekdays["mon"] += " " + line[pos_mon:pos_tue].replace("\n", " ").replace("Montag", "")
-            lines_weekdays["tue"] += " " + line[pos_tue:pos_wed].replace("\n", " ").replace("Dienstag", "")
-            lines_weekdays["wed"] += " " + line[pos_wed:pos_thu].replace("\n", " ").replace("Mittwoch", "")
-            lines_weekdays["thu"] += " " + line[pos_thu:pos_fri].replace("\n", " ").replace("Donnerstag", "")
-            lines_weekdays["fri"] += " " + line[pos_fri:].replace("\n", " ").replace("Freitag", "")
+        lines_weekdays = {}
+        for (key, weekday), column in zip(self.weekdays.items(), layout.join(lines)):
+            lines_weekdays[key] = column.replace(weekday, "")
 
         # currently, up to 5 dishes are on the menu
         num_dishes = 5
@@ -308,15 +480,12 @@ class FMIBistroMenuParser(MenuParser):
             for (dish_name, price, dish_allergen) in list(zip(dish_names, prices, dish_allergens)):
                 # filter empty dishes
                 if dish_name:
-                    ingredients = Ingredients("fmi-bistro")
-                    ingredients.parse_ingredients(dish_allergen)
-                    dishes.append(Dish(dish_name, price, ingredients.ingredient_set, "Tagesgericht"))
+                    dishes.append(Dish.from_markers(dish_name, price, "fmi-bistro", [dish_allergen], "Tagesgericht"))
             dishes = dishes[:num_dishes]
             date = self.get_date(year, week_number, self.weekday_positions[key])
             # create new Menu object and add it to dict
-            menu = Menu(date, dishes)
             # remove duplicates
-            menu.remove_duplicates()
+            menu = Menu(date, dishes).remove_duplicates()
             menus[date] = menu
 
         return menus
@@ -324,6 +493,8 @@ class FMIBistroMenuParser(MenuParser):
 
 class IPPBistroMenuParser(MenuParser):
     url = "http://konradhof-catering.de/ipp/"
+    # only convert the first page of the PDF (-l 1)
+    pdf_last_page = 1
     split_days_regex = re.compile(r'(Tagessuppe siehe Aushang|Aushang|Aschermittwoch|Feiertag|Geschlossen)',
                                   re.IGNORECASE)
     split_days_regex_soup_one_line = re.compile(r'T agessuppe siehe Aushang|Tagessuppe siehe Aushang', re.IGNORECASE)
@@ -332,43 +503,40 @@ class IPPBistroMenuParser(MenuParser):
     surprise_without_price_regex = re.compile(r"(Überraschungsmenü\s)(\s+[^\s\d]+)")
     """Detects the ‚Überraschungsmenü‘ keyword if it has not a price. The price is expected between the groups."""
     dish_regex = re.compile(r"(.+?)(\d+,\d+|\?€)\s€[^)]")
+    # all dishes have the same ingredients
+    ingredient_markers = "Mi,Gl,Sf,Sl,Ei,Se,4"
 
     def parse(self, location):
-        page = requests.get(self.url)
+        pdfs = self.get_pdfs(self.transport.fetch(self.url))
+        if len(pdfs) < 1:
+            return None
+        return self.parse_pdf_menus(pdfs, location)
+
+    async def parse_async(self, location, client):
+        pdfs = self.get_pdfs(await client.fetch(self.url))
+        if len(pdfs) < 1:
+            return None
+        return await self.parse_pdf_menus_async(pdfs, location, client)
+
+    def get_pdfs(self, page):
         # get html tree
-        tree = html.fromstring(page.content)
+        tree = html.fromstring(page)
         # get url of current pdf menu
         xpath_query = tree.xpath("//a[contains(@title, 'KW-')]/@href")
+        return [(pdf_url,) + self.get_year_and_week_number(pdf_url) for pdf_url in xpath_query]
 
-        if len(xpath_query) < 1:
-            return None
-
-        menus = {}
-        for pdf_url in xpath_query:
-            # Example PDF-name: KW-48_27.11-01.12.10.2017-3.pdf
-            pdf_name = pdf_url.split("/")[-1]
-            # more examples: https://regex101.com/r/hwdpFx/1
-            wn_year_match = re.search(r"KW[^a-zA-Z1-9]*([1-9]+\d*).*\d+\.\d+\.(\d+).*", pdf_name, re.IGNORECASE)
-            week_number = int(wn_year_match.group(1)) if wn_year_match else None
-            year = int(wn_year_match.group(2)) if wn_year_match else None
-            # convert 2-digit year into 4-digit year
-            year = 2000 + year if year is not None and len(str(year)) == 2 else year
-
-            with tempfile.NamedTemporaryFile() as temp_pdf:
-                # download pdf
-                response = requests.get(pdf_url)
-                temp_pdf.write(response.content)
-                with tempfile.NamedTemporaryFile() as temp_txt:
-                    # convert pdf to text by calling pdftotext; only convert first page to txt (-l 1)
-                    call(["pdftotext", "-l", "1", "-layout", temp_pdf.name, temp_txt.name])
-                    with open(temp_txt.name, 'r') as myfile:
-                        # read generated text file
-                        data = myfile.read()
-                        parsed_menus = self.get_menus(data, year, week_number)
-                        if parsed_menus is not None:
-                            menus.update(parsed_menus)
+    @staticmethod
+    def get_year_and_week_number(pdf_url):
+        # Example PDF-name: KW-48_27.11-01.12.10.2017-3.pdf
+        pdf_name = pdf_url.split("/")[-1]
+        # more examples: https://regex101.com/r/hwdpFx/1
+        wn_year_match = re.search(r"KW[^a-zA-Z1-9]*([1-9]+\d*).*\d+\.\d+\.(\d+).*", pdf_name, re.IGNORECASE)
+        week_number = int(wn_year_match.group(1)) if wn_year_match else None
+        year = int(wn_year_match.group(2)) if wn_year_match else None
+        # convert 2-digit year into 4-digit year
+        year = 2000 + year if year is not None and len(str(year)) == 2 else year
 
-        return menus
+        return year, week_number
 
     def get_menus(self, text, year, week_number):
         menus = {}
@@ -435,21 +603,11 @@ class IPPBistroMenuParser(MenuParser):
                 week_number, year, len(positions)))
             return None
 
-        pos_mon = positions[0][0]
-        pos_tue = positions[1][0]
-        pos_wed = positions[2][0]
-        pos_thu = positions[3][0]
-        pos_fri = positions[4][0]
+        layout = ColumnLayout.from_starts([start for start, _ in positions])
 
-        lines_weekdays = {"mon": "", "tue": "", "wed": "", "thu": "", "fri": ""}
         # it must be lines[3:] instead of lines[2:] or else the menus would start with "Preis ab 0,90€" (from the
         # soups) instead of the first menu, if there is a day where the bistro is closed.
-        for line in lines[soup_line_index + 3:]:
-            lines_weekdays["mon"] += " " + line[pos_mon:pos_tue].replace("\n", " ")
-            lines_weekdays["tue"] += " " + line[pos_tue:pos_wed].replace("\n", " ")
-            lines_weekdays["wed"] += " " + line[pos_wed:pos_thu].replace("\n", " ")
-            lines_weekdays["thu"] += " " + line[pos_thu:pos_fri].replace("\n", " ")
-            lines_weekdays["fri"] += " " + line[pos_fri:].replace("\n", " ")
+        lines_weekdays = dict(zip(("mon", "tue", "wed", "thu", "fri"), layout.join(lines[soup_line_index + 3:])))
 
         for key in lines_weekdays:
             # Appends `?€` to „Überraschungsmenü“ if it do not have a price. The second '€' is a separator for the
@@ -468,21 +626,17 @@ class IPPBistroMenuParser(MenuParser):
             else:
                 dish_types = ["Tagesgericht"] * len(dish_names_price)
 
-            # create ingredients
-            # all dishes have the same ingridients
-            ingredients = Ingredients("ipp-bistro")
-            ingredients.parse_ingredients("Mi,Gl,Sf,Sl,Ei,Se,4")
             # create list of Dish objects
             counter = 0
             dishes = []
             for (dish_name, price) in dish_names_price:
-                dishes.append(Dish(dish_name.strip(), price.replace(',', '.').strip(), ingredients.ingredient_set, dish_types[counter]))
+                dishes.append(Dish.from_markers(dish_name.strip(), price.replace(',', '.').strip(), "ipp-bistro",
+                                                [self.ingredient_markers], dish_types[counter]))
                 counter += 1
             date = self.get_date(year, week_number, self.weekday_positions[key])
             # create new Menu object and add it to dict
-            menu = Menu(date, dishes)
             # remove duplicates
-            menu.remove_duplicates()
+            menu = Menu(date, dishes).remove_duplicates()
             menus[date] = menu
 
         return menus
@@ -491,37 +645,53 @@ class IPPBistroMenuParser(MenuParser):
 class MedizinerMensaMenuParser(MenuParser):
     startPageurl = "https://www.sv.tum.de/med/startseite/"
     baseUrl = "https://www.sv.tum.de"
-    ingredients_regex = r"(\s([A-C]|[E-H]|[K-P]|[R-Z]|[1-9])(,([A-C]|[E-H]|[K-P]|[R-Z]|[1-9]))*(\s|\Z))"
-    price_regex = r"(\d+(,(\d){2})\s?€)"
-
-    def parse_dish(self, dish_str):
-        # ingredients
-        dish_ingredients = Ingredients("mediziner-mensa")
-        matches = re.findall(self.ingredients_regex, dish_str)
-        while len(matches) > 0:
-            for x in matches:
-                if len(x) > 0:
-                    dish_ingredients.parse_ingredients(x[0])
-            dish_str = re.sub(self.ingredients_regex, " ", dish_str)
-            matches = re.findall(self.ingredients_regex, dish_str)
-        dish_str = re.sub(r"\s+", " ", dish_str).strip()
-        dish_str = dish_str.replace(" , ", ", ")
+    # only convert the first page of the PDF (-l 1)
+    pdf_last_page = 1
+    ingredients_regex = re.compile(r"([A-C]|[E-H]|[K-P]|[R-Z]|[1-9])(,([A-C]|[E-H]|[K-P]|[R-Z]|[1-9]))*")
+    """Matches a whole token of comma separated ingredient codes (e.g. 'B,N')."""
+    price_regex = re.compile(r"(\d+(,(\d){2})\s?€)")
+    # the soup and the main dishes columns of a day; the columns of the PDF have a fixed width
+    day_layout = ColumnLayout([(0, 36), (40, 100)])
+
+    def parse_dish(self, dish_str, dish_type="Tagesgericht"):
+        # ingredients: every whitespace separated token consisting of ingredient codes only; a code always follows
+        # the name, so a token at the very beginning of the string is part of the name
+        markers = []
+        name_tokens = []
+        for index, token in enumerate(dish_str.split()):
+            if (index > 0 or dish_str[:1].isspace()) and self.ingredients_regex.fullmatch(token):
+                markers.append(token)
+            else:
+                name_tokens.append(token)
+        dish_str = " ".join(name_tokens).replace(" , ", ", ")
+
+        # price; if there are several ones, the last one is used
+        prices = []
 
-        # price
-        dish_price = "N/A"
-        for x in re.findall(self.price_regex, dish_str):
-            if len(x) > 0:
-                dish_price = float(x[0].replace("€", "").replace(",", ".").strip())
-        dish_str = re.sub(self.price_regex, "", dish_str)
+        def remove_price(match):
+            prices.append(match.group(1))
+            return ""
+        dish_str = self.price_regex.sub(remove_price, dish_str)
+        dish_price = float(prices[-1].replace("€", "").replace(",", ".").strip()) if prices else "N/A"
 
-        return Dish(dish_str, dish_price, dish_ingredients.ingredient_set, "Tagesgericht")
+        return Dish.from_markers(dish_str, dish_price, "mediziner-mensa", markers, dish_type)
 
     def parse(self, location):
-        page = requests.get(self.startPageurl)
+        pdf = self.get_pdf(self.transport.fetch(self.startPageurl))
+        if pdf is None:
+            return None
+        return self.parse_pdf(pdf, location)
+
+    async def parse_async(self, location, client):
+        pdf = self.get_pdf(await client.fetch(self.startPageurl))
+        if pdf is None:
+            return None
+        return await self.parse_pdf_async(pdf, location, client)
+
+    def get_pdf(self, page):
         # get html tree
-        tree = html.fromstring(page.content)
+        tree = html.fromstring(page)
         # get url of current pdf menu
-        s = html.tostring(tree, encoding='utf8', method='xml')
         xpath_query = tree.xpath("//a[contains(@href, 'Mensaplan/KW_')]/@href")
 
         if len(xpath_query) != 1:
@@ -536,18 +706,7 @@ class MedizinerMensaMenuParser(MenuParser):
         # convert 2-digit year into 4-digit year
         year = 2000 + year if year is not None and len(str(year)) == 2 else year
 
-        with tempfile.NamedTemporaryFile() as temp_pdf:
-            # download pdf
-            response = requests.get(pdf_url)
-            temp_pdf.write(response.content)
-            with tempfile.NamedTemporaryFile() as temp_txt:
-                # convert pdf to text by calling pdftotext; only convert first page to txt (-l 1)
-                call(["pdftotext", "-l", "1", "-layout", temp_pdf.name, temp_txt.name])
-                with open(temp_txt.name, 'r') as myfile:
-                    # read generated text file
-                    data = myfile.read()
-                    menus = self.get_menus(data, year, week_number)
-                    return menus
+        return pdf_url, year, week_number
 
     def get_menus(self, text, year, week_number):
         menus = {}
@@ -594,18 +753,12 @@ class MedizinerMensaMenuParser(MenuParser):
 
         for key in days:
             day_lines = unicodedata.normalize("NFKC", days[key]).splitlines(True)
-            soup_str = ""
-            mains_str = ""
-            for day_line in day_lines:
-                soup_str += day_line[:36].strip() + "\n"
-                mains_str += day_line[40:100].strip() + "\n"
+            soup_cells, mains_cells = self.day_layout.split(day_lines)
+            soup_str = "".join(cell.strip() + "\n" for cell in soup_cells)
+            mains_str = "".join(cell.strip() + "\n" for cell in mains_cells)
 
             soup_str = soup_str.replace("-\n", "").strip().replace("\n", " ")
-            soup = self.parse_dish(soup_str)
-            if len(dish_types) > 0:
-                soup.dish_type = dish_types[0]
-            else:
-                soup.dish_type = "Suppe"
+            soup = self.parse_dish(soup_str, dish_types[0] if len(dish_types) > 0 else "Suppe")
             dishes = []
             if (soup.name not in ["", "Feiertag"]):
                 dishes.append(soup)
@@ -622,17 +775,14 @@ class MedizinerMensaMenuParser(MenuParser):
                     dish_type = "Extraessen"
                     continue
                 dish_str = dish_str.strip().replace("\n", " ")
-                dish = self.parse_dish(dish_str)
-                dish.name = dish.name.strip()
-                if dish.name not in ["", "Feiertag"]:
-                    if dish_type:
-                        dish.dish_type = dish_type
-                    dishes.append(dish)
+                dish = self.parse_dish(dish_str, dish_type if dish_type else "Tagesgericht")
+                dish_name = dish.name.strip()
+                if dish_name not in ["", "Feiertag"]:
+                    dishes.append(dish.replace(name=dish_name))
 
             date = self.get_date(year, week_number, self.weekday_positions[key])
-            menu = Menu(date, dishes)
             # remove duplicates
-            menu.remove_duplicates()
+            menu = Menu(date, dishes).remove_duplicates()
             menus[date] = menu
 
         return menus
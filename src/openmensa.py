@@ -1,18 +1,102 @@
+from collections import OrderedDict
 from pyopenmensa.feed import LazyBuilder
 from datetime import date
 
-def openmensa(weeks, directory):
-    canteen = weeksToCanteenFeed(weeks)
+from lxml import etree
 
-    writeFeedToFile(canteen, directory)
+from output import AtomicOutput
+
+namespace = "http://openmensa.org/open-mensa-v2"
+xsi_namespace = "http://www.w3.org/2001/XMLSchema-instance"
+default_category = "Speiseplan"
+"""The category of dishes without a dish type."""
+unknown_prices = ("", "N/A", "?")
+"""Price strings which mean that the price is unknown; all other price strings are added as note."""
+
+def openmensa(weeks, directory, output=None):
+    # the feed is streamed to disk and only replaced if it changed
+    if output is None:
+        output = AtomicOutput()
+    with output.open("%s/feed.xml" % (str(directory)), binary=True) as outfile:
+        writeFeed(weeks, outfile)
+
+def writeFeed(weeks, outfile):
+    """
+    Streams the OpenMensa v2 feed of `weeks` to `outfile` (opened in binary mode).
+
+    Every element is written as soon as it is complete, so the feed is never held in memory. The dish types become
+    the categories of the meals, numeric prices become prices and all other price strings notes.
+    """
+    with etree.xmlfile(outfile, encoding="UTF-8") as xf:
+        xf.write_declaration()
+        with xf.element(getTag("openmensa"),
+                        {"version": "2.1", "{%s}schemaLocation" % xsi_namespace: "%s %s.xsd" % (namespace, namespace)},
+                        nsmap={None: namespace, "xsi": xsi_namespace}):
+            xf.write(getIndent(1))
+            with xf.element(getTag("canteen")):
+                for week in weeks.values():
+                    for menu in week.days:
+                        writeDay(xf, menu)
+                xf.write(getIndent(1))
+            xf.write(getIndent(0))
+
+def writeDay(xf, menu):
+    # group the dishes by category, keeping the order of their first occurrence
+    categories = OrderedDict()
+    for dish in menu.dishes:
+        if dish.name:
+            categories.setdefault(dish.dish_type or default_category, []).append(dish)
+    if not categories:
+        return
+
+    xf.write(getIndent(2))
+    with xf.element(getTag("day"), date=str(menu.menu_date)):
+        for category_name, dishes in categories.items():
+            xf.write(getIndent(3))
+            with xf.element(getTag("category"), name=category_name):
+                for dish in dishes:
+                    xf.write(getIndent(4))
+                    with xf.element(getTag("meal")):
+                        writeMeal(xf, dish)
+                xf.write(getIndent(3))
+        xf.write(getIndent(2))
+
+def writeMeal(xf, dish):
+    # OpenMensa limits names to 250 characters
+    writeTextElement(xf, "name", dish.name if len(dish.name) <= 250 else dish.name[:247] + "...")
+    price = getPriceInCents(dish.price)
+    if price is None and str(dish.price).strip() not in unknown_prices:
+        writeTextElement(xf, "note", str(dish.price).strip())
+    if price is not None:
+        writeTextElement(xf, "price", "%d.%02d" % (price // 100, price % 100), role="other")
+    xf.write(getIndent(4))
+
+def writeTextElement(xf, name, text, **attributes):
+    xf.write(getIndent(5))
+    with xf.element(getTag(name), **attributes):
+        xf.write(text)
+
+def getTag(name):
+    return "{%s}%s" % (namespace, name)
+
+def getIndent(level):
+    return "\n" + "  " * level
+
+def getPriceInCents(price):
+    """Returns the price in cents, or None if `price` is no number (e.g. "0.68€ / 100g")."""
+    if isinstance(price, str):
+        try:
+            price = float(price)
+        except ValueError:
+            return None
+    if isinstance(price, bool) or not isinstance(price, (int, float)) or price < 0:
+        return None
+    return int(round(price * 100))
 
 def weeksToCanteenFeed(weeks):
     canteen = LazyBuilder() # canteen container
     # iterate through weeks
-    for calendar_week in weeks:
-        # get Week object
-        week = weeks[calendar_week]
-        # get year of calendar week
+    for week in weeks.values():
         days = week.days
 
         # iterate through days
@@ -31,6 +115,9 @@ def addDishToCanteen(dish, date, canteen):
         prices = {}
     canteen.addMeal(date, 'Speiseplan', dish.name, prices=prices)
 
-def writeFeedToFile(canteen, directory):
-    with open("%s/feed.xml" % (str(directory)), 'w') as outfile:
+def writeFeedToFile(canteen, directory, output=None):
+    # the feed is only replaced if it changed
+    if output is None:
+        output = AtomicOutput()
+    with output.open("%s/feed.xml" % (str(directory))) as outfile:
         outfile.write(canteen.toXMLFeed())
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+import util
+
+# orjson is optional; it is only used for compact output
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# brotli is optional as well; without it, only gzip compressed copies are written
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class AtomicOutput:
+    """
+    Writes output files atomically and only if their content changed.
+
+    Every file is written to a temporary file in the same directory first. If the old file has the same content, the
+    temporary file is discarded, so unchanged files keep their modification time (and CDN caches and rsync deltas
+    stay valid). Otherwise it replaces the old file by renaming, so readers never see a partially written file.
+
+    With `precompress`, compressed copies (`<file>.gz` and, if `brotli` is installed, `<file>.br`) are written next
+    to every file, so static file servers can serve them without compressing on every request. They are only
+    recompressed if the file changed (or a copy is missing or older than the file).
+    """
+
+    def __init__(self, precompress: bool = False, compress_level: int = 9) -> None:
+        """
+        Args:
+            precompress: Whether to write compressed copies of every file.
+            compress_level: The gzip compression level (1-9); also used as brotli quality.
+        """
+        self.precompress = precompress
+        self.compress_level = compress_level
+        self.written = 0
+        self.unchanged = 0
+        self.compressed = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def open(self, path: str, binary: bool = False):
+        """
+        Returns a context manager yielding a file object for writing the new content of `path` (UTF-8 encoded text
+        unless `binary` is set). The file is committed when the context is left without an exception.
+        """
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp-")
+        try:
+            with (os.fdopen(fd, "wb") if binary else os.fdopen(fd, "w", encoding="utf-8")) as outfile:
+                yield outfile
+            self.commit(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    def commit(self, temp_path: str, path: str) -> bool:
+        """
+        Moves `temp_path` to `path` unless both have the same content.
+
+        Returns:
+            Whether `path` has been written.
+        """
+        if self.is_unchanged(temp_path, path):
+            os.unlink(temp_path)
+            with self._lock:
+                self.unchanged += 1
+            if self.precompress:
+                self.compress(path, only_stale=True)
+            return False
+
+        # mkstemp creates files only readable by the owner; keep the permissions of the old file instead
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            mode = 0o644
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+        with self._lock:
+            self.written += 1
+        if self.precompress:
+            self.compress(path)
+        return True
+
+    def compress(self, path: str, only_stale: bool = False) -> None:
+        """
+        Writes the compressed copies of `path`. With `only_stale`, only copies which are missing or older than `path`
+        (e.g. since it has been written by a run without `precompress`) are written.
+        """
+        content = None
+        for suffix, compress in get_compressors():
+            compressed_path = path + suffix
+            if only_stale and not is_older(compressed_path, path):
+                continue
+            if content is None:
+                with open(path, "rb") as infile:
+                    content = infile.read()
+            util.atomic_write(compressed_path, compress(content, self.compress_level),
+                              stat.S_IMODE(os.stat(path).st_mode))
+            with self._lock:
+                self.compressed += 1
+
+    @staticmethod
+    def is_unchanged(temp_path: str, path: str) -> bool:
+        try:
+            if os.path.getsize(temp_path) != os.path.getsize(path):
+                return False
+        except FileNotFoundError:
+            return False
+        return get_digest(temp_path) == get_digest(path)
+
+    def __repr__(self):
+        if self.precompress:
+            return "output: %d files written, %d unchanged, %d compressed copies written" % (
+                self.written, self.unchanged, self.compressed)
+        return "output: %d files written, %d unchanged" % (self.written, self.unchanged)
+
+
+def is_older(path: str, other_path: str) -> bool:
+    """Returns whether `path` is missing or has been modified before `other_path`."""
+    try:
+        return os.stat(path).st_mtime_ns < os.stat(other_path).st_mtime_ns
+    except FileNotFoundError:
+        return True
+
+
+def get_digest(path: str) -> bytes:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def gzip_compress(content: bytes, level: int) -> bytes:
+    # neither a timestamp nor a file name is stored, so the same content always results in the same file
+    buffer = io.BytesIO()
+    with gzip.GzipFile(filename="", mode="wb", fileobj=buffer, compresslevel=level, mtime=0) as gzip_file:
+        gzip_file.write(content)
+    return buffer.getvalue()
+
+
+def brotli_compress(content: bytes, level: int) -> bytes:
+    return brotli.compress(content, quality=level)
+
+
+def get_compressors():
+    """Returns (suffix, compress function) of all available compressions."""
+    if brotli is None:
+        return [(".gz", gzip_compress)]
+    return [(".gz", gzip_compress), (".br", brotli_compress)]
+
+
+class JsonWriter:
+    """
+    Writes JSON output files, serializing every object exactly once.
+
+    By default the files are indented by four spaces, like they have always been published. The compact mode omits
+    all whitespace and uses a faster encoder (e.g. `orjson`) if one is available.
+    """
+
+    def __init__(self, compact: bool = False, encoder: Optional[Callable[[object], bytes]] = None,
+                 output: Optional[AtomicOutput] = None) -> None:
+        """
+        Args:
+            compact: Whether to omit indentation and whitespace.
+            encoder: A callable serializing an object to compact UTF-8 encoded JSON; defaults to `orjson.dumps` (if
+                installed) in compact mode.
+            output: The `AtomicOutput` the files are written with (e.g. to share its counters).
+        """
+        self.compact = compact
+        self.output = output if output is not None else AtomicOutput()
+        if encoder is None and compact and orjson is not None:
+            encoder = orjson.dumps
+        self.encoder = encoder
+
+    def write(self, path: str, obj) -> None:
+        """Serializes `obj` to the file `path`."""
+        if self.encoder is not None:
+            with self.output.open(path, binary=True) as outfile:
+                outfile.write(self.encoder(obj))
+        elif self.compact:
+            with self.output.open(path) as outfile:
+                outfile.write(json.dumps(obj, ensure_ascii=False, separators=(",", ":")))
+        else:
+            # stream the encoded chunks straight to the (buffered) file
+            with self.output.open(path) as outfile:
+                json.dump(obj, outfile, indent=4, ensure_ascii=False)
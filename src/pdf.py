@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import hashlib
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence
+
+import util
+
+
+class PreExtractedText(bytes):
+    """
+    Marks a response body which already is the `pdftotext -layout` output of a PDF (e.g. a recorded test asset), so
+    the extractor returns it as it is.
+    """
+
+
+class PdfTextCache:
+    """
+    Content-addressed on-disk cache of `pdftotext` output.
+
+    Entries are keyed by the SHA-256 of the PDF bytes and the `pdftotext` arguments, so an unchanged PDF is never
+    converted twice. The cache is bounded to `max_size` bytes; the least recently used entries are evicted first.
+    """
+
+    def __init__(self, directory: str, max_size: int = 64 * 1024 * 1024) -> None:
+        """
+        Args:
+            directory: The directory the extracted texts are stored in.
+            max_size: The maximum total size of all entries in bytes.
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def get_key(pdf: bytes, args: Sequence[str]) -> str:
+        digest = hashlib.sha256(pdf)
+        digest.update(b"\0" + " ".join(args).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        path = os.path.join(self.directory, key + ".txt")
+        try:
+            with open(path, "rb") as entry:
+                text = entry.read().decode("utf-8")
+            # mark the entry as recently used
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        util.atomic_write(os.path.join(self.directory, key + ".txt"), text.encode("utf-8"))
+        self._evict()
+
+    def _evict(self) -> None:
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".txt"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_size = sum(size for _, size, _ in entries)
+            # remove the least recently used entries until the cache fits into max_size
+            for _, size, path in sorted(entries):
+                if total_size <= self.max_size:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total_size -= size
+
+    def __repr__(self):
+        return "pdftotext cache: %d hits, %d misses" % (self.hits, self.misses)
+
+
+class PdfTextExtractor:
+    """
+    Converts PDFs to layout preserving text by piping them through `pdftotext`.
+
+    The PDF is passed via stdin and the text is read from stdout, so no temporary files are involved. At most
+    `max_workers` `pdftotext` processes run at the same time, no matter how many threads use the extractor. If a
+    `PdfTextCache` is given, PDFs which have already been converted are not passed to `pdftotext` again.
+    """
+
+    def __init__(self, timeout: float = 60.0, max_workers: int = 2, cache: Optional[PdfTextCache] = None) -> None:
+        """
+        Args:
+            timeout: Seconds after which a `pdftotext` process gets killed.
+            max_workers: The maximum number of `pdftotext` processes running in parallel.
+            cache: An optional cache of already extracted texts.
+        """
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.cache = cache
+        self._slots = threading.BoundedSemaphore(max_workers)
+        # asyncio semaphores are bound to an event loop, so every loop gets its own
+        self._async_slots = {}
+
+    @staticmethod
+    def get_args(first_page: Optional[int] = None, last_page: Optional[int] = None) -> List[str]:
+        """Returns the `pdftotext` options for converting the given page range."""
+        args = ["-layout"]
+        if first_page is not None:
+            args += ["-f", str(first_page)]
+        if last_page is not None:
+            args += ["-l", str(last_page)]
+        return args
+
+    def extract(self, pdf: bytes, first_page: Optional[int] = None, last_page: Optional[int] = None) -> str:
+        """
+        Returns the text of the PDF.
+
+        Args:
+            pdf: The content of the PDF file.
+            first_page: The first page to convert (`-f`); defaults to the first page of the document.
+            last_page: The last page to convert (`-l`); defaults to the last page of the document.
+
+        Raises:
+            subprocess.CalledProcessError: If `pdftotext` failed.
+            subprocess.TimeoutExpired: If `pdftotext` did not finish within the timeout.
+        """
+        if isinstance(pdf, PreExtractedText):
+            return pdf.decode("utf-8")
+        args = self.get_args(first_page, last_page)
+        if self.cache is None:
+            return self._run_pdftotext(pdf, args)
+
+        key = self.cache.get_key(pdf, args)
+        text = self.cache.get(key)
+        if text is None:
+            text = self._run_pdftotext(pdf, args)
+            self.cache.put(key, text)
+        return text
+
+    def _run_pdftotext(self, pdf: bytes, args: List[str]) -> str:
+        # '-' as input and output file lets pdftotext read from stdin and write to stdout
+        command = ["pdftotext"] + args + ["-", "-"]
+        with self._slots:
+            result = subprocess.run(command, input=pdf, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                    timeout=self.timeout, check=True)
+        return result.stdout.decode("utf-8")
+
+    async def extract_async(self, pdf: bytes, first_page: Optional[int] = None,
+                            last_page: Optional[int] = None) -> str:
+        """Like `extract`, but runs `pdftotext` as asyncio subprocess without blocking the event loop."""
+        if isinstance(pdf, PreExtractedText):
+            return pdf.decode("utf-8")
+        args = self.get_args(first_page, last_page)
+        if self.cache is None:
+            return await self._run_pdftotext_async(pdf, args)
+
+        key = self.cache.get_key(pdf, args)
+        text = self.cache.get(key)
+        if text is None:
+            text = await self._run_pdftotext_async(pdf, args)
+            self.cache.put(key, text)
+        return text
+
+    async def _run_pdftotext_async(self, pdf: bytes, args: List[str]) -> str:
+        loop = asyncio.get_event_loop()
+        if loop not in self._async_slots:
+            self._async_slots[loop] = asyncio.BoundedSemaphore(self.max_workers)
+
+        command = ["pdftotext"] + args + ["-", "-"]
+        async with self._async_slots[loop]:
+            process = await asyncio.create_subprocess_exec(*command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                                           stderr=subprocess.PIPE)
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(pdf), self.timeout)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                raise subprocess.TimeoutExpired(command, self.timeout)
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, command, stdout, stderr)
+        return stdout.decode("utf-8")
+
+    def extract_many(self, pdfs: Sequence[bytes], first_page: Optional[int] = None,
+                     last_page: Optional[int] = None) -> List[str]:
+        """Converts several PDFs in parallel and returns their texts in the same order."""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(lambda pdf: self.extract(pdf, first_page, last_page), pdfs))
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+Binary snapshot of the parsed menus of all locations, written with `main.py --snapshot PATH`.
+
+All integers are little endian. The file consists of:
+
+* a header: magic, version, the number of strings, locations, days and dishes and the offset of every section,
+* a string table: the end offsets of all strings followed by the UTF-8 encoded strings themselves (dish names,
+  dish types, ingredient codes joined by commas, text prices and location names, each stored once),
+* the locations, sorted by name: (name string, first day, number of days),
+* the days, sorted by location and date: (date ordinal, first dish, number of dishes),
+* the dishes: (name string, dish type string, ingredients string, price kind, price).
+
+Every record has a fixed width, so a reader can `mmap` the file and decode any record in place.
+"""
+
+import mmap
+import struct
+from collections.abc import Mapping
+from datetime import date
+from typing import Iterator, List, Optional
+
+from entities import Dish, Menu
+from output import AtomicOutput
+
+magic = b"EATSNAP\0"
+version = 1
+
+header_format = struct.Struct("<8sIIIII4Q")
+string_offset_format = struct.Struct("<I")
+location_format = struct.Struct("<III")
+day_format = struct.Struct("<IIH2x")
+dish_format = struct.Struct("<IIIiB3x")
+
+# the price is stored in cents, or as index of a string (e.g. "0.68€ / 100g")
+price_cents = 0
+price_string = 1
+
+
+class StringTable:
+    """Assigns every distinct string an index."""
+
+    def __init__(self) -> None:
+        self.indices = {}
+        self.strings = []
+
+    def add(self, string: str) -> int:
+        index = self.indices.get(string)
+        if index is None:
+            index = self.indices[string] = len(self.strings)
+            self.strings.append(string)
+        return index
+
+    def to_bytes(self) -> bytes:
+        encoded = [string.encode("utf-8") for string in self.strings]
+        offsets = []
+        end = 0
+        for string in encoded:
+            end += len(string)
+            offsets.append(string_offset_format.pack(end))
+        return b"".join(offsets) + b"".join(encoded)
+
+
+def write_snapshot(path: str, menus_by_location, output: Optional[AtomicOutput] = None) -> None:
+    """
+    Writes the snapshot of the menus of all locations to `path`.
+
+    Args:
+        path: The path of the snapshot file.
+        menus_by_location: Maps every location to its menus (a mapping or iterable of `Menu` objects).
+        output: The `AtomicOutput` the file is written with; it is only replaced if it changed.
+    """
+    strings = StringTable()
+    locations = []
+    days = []
+    dishes = []
+    for location in sorted(menus_by_location):
+        menus = menus_by_location[location]
+        if isinstance(menus, Mapping):
+            menus = menus.values()
+        first_day = len(days)
+        for menu in sorted(menus, key=lambda menu: menu.menu_date):
+            days.append(day_format.pack(menu.menu_date.toordinal(), len(dishes), len(menu.dishes)))
+            for dish in menu.dishes:
+                if isinstance(dish.price, str):
+                    price_kind, price = price_string, strings.add(dish.price)
+                else:
+                    price_kind, price = price_cents, int(round(dish.price * 100))
+                dishes.append(dish_format.pack(strings.add(dish.name), strings.add(dish.dish_type),
+                                               strings.add(",".join(dish.ingredients.codes)), price, price_kind))
+        locations.append(location_format.pack(strings.add(location), first_day, len(days) - first_day))
+
+    string_table = strings.to_bytes()
+    strings_offset = header_format.size
+    locations_offset = strings_offset + len(string_table)
+    days_offset = locations_offset + len(locations) * location_format.size
+    dishes_offset = days_offset + len(days) * day_format.size
+    header = header_format.pack(magic, version, len(strings.strings), len(locations), len(days), len(dishes),
+                                strings_offset, locations_offset, days_offset, dishes_offset)
+
+    if output is None:
+        output = AtomicOutput()
+    with output.open(path, binary=True) as outfile:
+        for chunk in [header, string_table] + locations + days + dishes:
+            outfile.write(chunk)
+
+
+class SnapshotReader:
+    """
+    Reads a snapshot written by `write_snapshot` through `mmap`.
+
+    Opening only reads the header; records are decoded when they are accessed, directly from the mapped file. Days
+    are found by binary search over the days of a location, so any lookup is answered right after opening.
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as snapshot_file:
+            self.mmap = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mmap)
+        if len(self.view) < header_format.size:
+            self.close()
+            raise ValueError("%s is no snapshot" % path)
+        (file_magic, file_version, self.num_strings, self.num_locations, self.num_days, self.num_dishes,
+         self.strings_offset, self.locations_offset, self.days_offset, self.dishes_offset) = \
+            header_format.unpack_from(self.view)
+        if file_magic != magic or file_version != version:
+            self.close()
+            raise ValueError("%s is no snapshot of version %d" % (path, version))
+        self.text_offset = self.strings_offset + self.num_strings * string_offset_format.size
+
+    def close(self) -> None:
+        self.view.release()
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get_string(self, index: int) -> str:
+        end = string_offset_format.unpack_from(self.view, self.strings_offset + index * string_offset_format.size)[0]
+        start = string_offset_format.unpack_from(
+            self.view, self.strings_offset + (index - 1) * string_offset_format.size)[0] if index > 0 else 0
+        return str(self.view[self.text_offset + start:self.text_offset + end], "utf-8")
+
+    def get_location(self, index: int):
+        return location_format.unpack_from(self.view, self.locations_offset + index * location_format.size)
+
+    def find_location(self, location: str):
+        # the locations are sorted by name
+        low, high = 0, self.num_locations
+        while low < high:
+            middle = (low + high) // 2
+            name_index, first_day, num_days = self.get_location(middle)
+            name = self.get_string(name_index)
+            if name == location:
+                return first_day, num_days
+            if name < location:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def locations(self) -> List[str]:
+        return [self.get_string(self.get_location(index)[0]) for index in range(self.num_locations)]
+
+    def get_day(self, index: int):
+        return day_format.unpack_from(self.view, self.days_offset + index * day_format.size)
+
+    def get_dish(self, index: int) -> Dish:
+        name, dish_type, ingredients, price, price_kind = \
+            dish_format.unpack_from(self.view, self.dishes_offset + index * dish_format.size)
+        ingredients = self.get_string(ingredients)
+        return Dish(self.get_string(name), price / 100 if price_kind == price_cents else self.get_string(price),
+                    ingredients.split(",") if ingredients else (), self.get_string(dish_type))
+
+    def get_menu(self, index: int) -> Menu:
+        ordinal, first_dish, num_dishes = self.get_day(index)
+        return Menu(date.fromordinal(ordinal),
+                    [self.get_dish(dish) for dish in range(first_dish, first_dish + num_dishes)])
+
+    def menu(self, location: str, menu_date: date) -> Optional[Menu]:
+        """Returns the menu of `location` on `menu_date`, or None if there is none."""
+        found = self.find_location(location)
+        if found is None:
+            return None
+        first_day, num_days = found
+        # the days of a location are sorted by date
+        ordinal = menu_date.toordinal()
+        low, high = first_day, first_day + num_days
+        while low < high:
+            middle = (low + high) // 2
+            if self.get_day(middle)[0] < ordinal:
+                low = middle + 1
+            else:
+                high = middle
+        if low < first_day + num_days and self.get_day(low)[0] == ordinal:
+            return self.get_menu(low)
+        return None
+
+    def dates(self, location: str) -> List[date]:
+        """Returns the dates of all menus of `location`."""
+        first_day, num_days = self.find_location(location) or (0, 0)
+        return [date.fromordinal(self.get_day(index)[0]) for index in range(first_day, first_day + num_days)]
+
+    def menus(self, location: str) -> Iterator[Menu]:
+        """Yields all menus of `location`, sorted by date."""
+        first_day, num_days = self.find_location(location) or (0, 0)
+        for index in range(first_day, first_day + num_days):
+            yield self.get_menu(index)
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import unittest
+from datetime import date
+
+import cli
+from archive import MenuArchive, get_next_week
+from entities import Dish, Menu
+from menu_parser import location_cities
+
+
+class MenuArchiveTest(unittest.TestCase):
+    salad = Dish("Salatteller", "0.68€ / 100g", {"v"}, "Self-Service")
+    curry = Dish("Gemüsecurry", 2.4, {"v", "Sl"}, "Tagesgericht 3")
+    schnitzel = Dish("Schweineschnitzel", 3.5, {"S", "Gl", "Ei"}, "Aktionsessen 8")
+
+    def setUp(self):
+        self.archive_dir = tempfile.TemporaryDirectory()
+        self.archive = MenuArchive(os.path.join(self.archive_dir.name, "archive.db"))
+        self.archive.write({
+            "mensa-garching": {date(2017, 11, 6): Menu(date(2017, 11, 6), [self.schnitzel, self.curry]),
+                               date(2017, 11, 13): Menu(date(2017, 11, 13), [self.curry, self.salad])},
+            "stucafe-garching": [Menu(date(2017, 11, 14), [self.salad])],
+            "mensa-arcisstr": [Menu(date(2017, 11, 13), [self.curry])],
+            "fmi-bistro": [Menu(date(2017, 11, 15), [self.curry])],
+        })
+
+    def tearDown(self):
+        self.archive.close()
+        self.archive_dir.cleanup()
+
+    def test_Should_FindVeganDishes_When_FilteringByLocationAndDate(self):
+        # the FMI Bistro is in Garching as well, although its name does not say so
+        self.assertEqual([("mensa-garching", date(2017, 11, 13), self.curry),
+                          ("mensa-garching", date(2017, 11, 13), self.salad),
+                          ("stucafe-garching", date(2017, 11, 14), self.salad),
+                          ("fmi-bistro", date(2017, 11, 15), self.curry)],
+                         self.archive.find_dishes(city="garching", start=date(2017, 11, 13), end=date(2017, 11, 19),
+                                                  vegan=True))
+        self.assertEqual([("mensa-arcisstr", date(2017, 11, 13), self.curry),
+                          ("mensa-garching", date(2017, 11, 13), self.curry)],
+                         self.archive.find_dishes(with_codes=["Sl"], start=date(2017, 11, 13), end=date(2017, 11, 14)))
+        self.assertEqual([("mensa-garching", date(2017, 11, 6), self.curry)],
+                         self.archive.find_dishes(locations=["mensa-garching"], end=date(2017, 11, 12),
+                                                  without_codes=["S"]))
+
+    def test_Should_ReplaceDays_When_WrittenAgain(self):
+        self.archive.write({"mensa-garching": [Menu(date(2017, 11, 6), [self.salad])]})
+        self.assertEqual([self.salad], [dish for _, _, dish in self.archive.find_dishes(end=date(2017, 11, 6))])
+        self.assertEqual(0, self.archive.connection.execute(
+            "SELECT count(*) FROM dish_ingredients WHERE code = 'S'").fetchone()[0])
+
+    def test_Should_KnowCityOfEveryLocation(self):
+        self.assertEqual(set(cli.locations), set(location_cities))
+
+    def test_Should_ReturnFollowingWeek_When_GettingNextWeek(self):
+        self.assertEqual((date(2017, 11, 13), date(2017, 11, 19)), get_next_week(date(2017, 11, 12)))
+        self.assertEqual((date(2017, 11, 13), date(2017, 11, 19)), get_next_week(date(2017, 11, 6)))
+
+
+if __name__ == '__main__':
+    unittest.main()
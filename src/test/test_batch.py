@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import unittest
+from datetime import date
+
+import batch
+from entities import Dish, Menu
+
+
+class FakeParser:
+    def __init__(self):
+        self.parsed = []
+
+    def get_fetch_key(self, location):
+        return {"mensa-arcisstrasse": "mensa-arcisstr"}.get(location, location)
+
+    def parse(self, location):
+        self.parsed.append(location)
+        return self.get_menus(location)
+
+    async def parse_async(self, location, client):
+        self.parsed.append(location)
+        await asyncio.sleep(0)
+        return self.get_menus(location)
+
+    def get_menus(self, location):
+        if location == "broken":
+            raise ConnectionError("site down")
+        if location == "empty":
+            return None
+        menu_date = date(2017, 3, 27)
+        return {menu_date: Menu(menu_date, [Dish("Gulasch", 1.9, set(["S"]), "Tagesgericht 3")])}
+
+
+fake_parser = FakeParser()
+
+
+def get_fake_parser(location):
+    return None if location == "unknown" else fake_parser
+
+
+class BatchTest(unittest.TestCase):
+
+    def test_Should_KeepOrderAndReportEveryLocation(self):
+        locations = ["mensa-garching", "broken", "empty", "unknown", "fmi-bistro"]
+        results = batch.parse_locations(locations, get_fake_parser, workers=2)
+
+        self.assertEqual(locations, [result.location for result in results])
+        self.assertEqual([True, False, False, False, True], [result.ok for result in results])
+        self.assertIsInstance(results[1].error, ConnectionError)
+        self.assertIsNone(results[2].error)
+        self.assertIsInstance(results[3].error, ValueError)
+        self.assertEqual("mensa-garching: OK (1 menus)", repr(results[0]))
+        self.assertEqual("broken: FAILED (ConnectionError: site down)", repr(results[1]))
+
+    def test_Should_ParseAliasesOnce(self):
+        fake_parser.parsed = []
+        locations = ["mensa-arcisstr", "fmi-bistro", "mensa-arcisstrasse", "fmi-bistro"]
+
+        self.assertEqual([["mensa-arcisstr", "mensa-arcisstrasse"], ["fmi-bistro"]],
+                         list(batch.plan_fetches(locations, get_fake_parser).values()))
+
+        results = batch.parse_locations(locations, get_fake_parser, workers=4)
+        self.assertEqual(["fmi-bistro", "mensa-arcisstr"], sorted(fake_parser.parsed))
+        self.assertEqual(["mensa-arcisstr", "fmi-bistro", "mensa-arcisstrasse"], [result.location for result in results])
+        self.assertIs(results[0].menus, results[2].menus)
+
+    def test_Should_ParseAllLocations_When_UsingAsyncio(self):
+        fake_parser.parsed = []
+        locations = ["mensa-arcisstr", "broken", "mensa-arcisstrasse", "empty"]
+
+        loop = asyncio.new_event_loop()
+        try:
+            results = loop.run_until_complete(batch.parse_locations_async(locations, get_fake_parser, None))
+        finally:
+            loop.close()
+
+        self.assertEqual(["broken", "empty", "mensa-arcisstr"], sorted(fake_parser.parsed))
+        self.assertEqual(locations, [result.location for result in results])
+        self.assertEqual([True, False, True, False], [result.ok for result in results])
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+import benchmark
+
+
+class BenchmarkTest(unittest.TestCase):
+
+    def test_Should_RunEveryBenchmark_When_CalledOnce(self):
+        for name, bench in benchmark.benchmarks.items():
+            with self.subTest(benchmark=name):
+                bench()()
+
+
+if __name__ == '__main__':
+    unittest.main()
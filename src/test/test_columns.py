@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from columns import ColumnLayout
+
+
+class ColumnLayoutTest(unittest.TestCase):
+    lines = ["Montag      Dienstag    Mittwoch",
+             "Suppe 1,00  Salat 2,00  Nudeln",
+             "            Brot 0,50   3,50"]
+
+    def test_Should_SliceLinesIntoColumns_When_DetectedFromAnchors(self):
+        layout = ColumnLayout.from_anchors(self.lines[0], ["Montag", "Dienstag", "Mittwoch"])
+        self.assertEqual([(0, 12), (12, 24), (24, None)], layout.spans)
+        self.assertEqual([["Montag      ", "Suppe 1,00  ", "            "],
+                          ["Dienstag    ", "Salat 2,00  ", "Brot 0,50   "],
+                          ["Mittwoch", "Nudeln", "3,50"]], layout.split(self.lines))
+        self.assertEqual(" Mittwoch Nudeln 3,50", layout.join(self.lines)[2])
+
+    def test_Should_Raise_When_AnchorIsMissing(self):
+        with self.assertRaises(ValueError):
+            ColumnLayout.from_anchors(self.lines[0], ["Montag", "Freitag"])
+
+    def test_Should_KeepShortLines_When_SlicingExplicitSpans(self):
+        layout = ColumnLayout([(0, 3), (5, 8)])
+        self.assertEqual([["abc", "x"], ["fgh", ""]], layout.split(["abcdefghij", "x"]))
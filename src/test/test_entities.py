@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+import pickle
+import unittest
+from datetime import date
+
+from entities import CalendarIndex, Dish, IngredientSet, Ingredients, Menu, Week, ingredient_registry
+
+
+class IngredientSetTest(unittest.TestCase):
+
+    def test_Should_BehaveLikeSetOfCodes(self):
+        ingredients = IngredientSet(["Mi", "Gl", "v"])
+        self.assertEqual({"Gl", "Mi", "v"}, ingredients)
+        self.assertEqual(["Gl", "Mi", "v"], list(ingredients))
+        self.assertEqual(3, len(ingredients))
+        self.assertIn("Mi", ingredients)
+        self.assertNotIn("S", ingredients)
+        self.assertEqual(hash(frozenset(["Gl", "Mi", "v"])), hash(ingredients))
+
+    def test_Should_CombineSetsByMask(self):
+        ingredients = IngredientSet(["Mi", "Gl"])
+        self.assertEqual({"Mi", "Gl", "Ei"}, ingredients | IngredientSet(["Ei"]))
+        self.assertEqual({"Mi", "Gl", "Ei", "So"}, ingredients.union(["Ei"], {"So"}))
+        self.assertEqual({"Mi"}, ingredients & {"Mi", "Ei"})
+        self.assertEqual({"Gl"}, ingredients - {"Mi"})
+        self.assertTrue(IngredientSet(["Mi"]) <= ingredients)
+        self.assertFalse(IngredientSet(["Ei"]) <= ingredients)
+
+    def test_Should_FilterDishes(self):
+        self.assertTrue(IngredientSet(["v", "Gl"]).is_vegan())
+        self.assertTrue(IngredientSet(["S", "Mi"]).contains_pork())
+        self.assertFalse(IngredientSet(["f", "Mi"]).contains_pork())
+        self.assertTrue(IngredientSet(["f", "Mi"]).is_free_of(["Gl", "Ei"]))
+        self.assertFalse(IngredientSet(["f", "Mi"]).is_free_of(["Mi"]))
+
+    def test_Should_RegisterUnknownCodes(self):
+        self.assertIsNone(ingredient_registry.find_bit("unknown-test-code"))
+        ingredients = IngredientSet(["unknown-test-code", "Gl"])
+        self.assertEqual(["Gl", "unknown-test-code"], list(ingredients))
+        # pickles store the codes, since bits of codes registered at runtime differ between processes
+        self.assertEqual(ingredients, pickle.loads(pickle.dumps(ingredients)))
+
+    def test_Should_SerializeSortedCodes(self):
+        dish = Dish("Pasta", "2,50", {"So", "Gl"}, "Tagesgericht")
+        self.assertIsInstance(dish.ingredients, IngredientSet)
+        self.assertEqual(["Gl", "So"], dish.to_json_obj()["ingredients"])
+
+
+class DishTest(unittest.TestCase):
+
+    def test_Should_RejectChanges_When_Constructed(self):
+        dish = Dish("Pasta", 2.5, {"Gl"}, "Tagesgericht")
+        with self.assertRaises(AttributeError):
+            dish.name = "Pizza"
+        changed = dish.replace(dish_type="Aktionsessen 1")
+        self.assertEqual("Tagesgericht", dish.dish_type)
+        self.assertEqual(Dish("Pasta", 2.5, {"Gl"}, "Aktionsessen 1"), changed)
+        self.assertNotEqual(dish, changed)
+
+    def test_Should_KeepEqualityAndHash_When_Pickled(self):
+        dish = Dish("Pasta", 2.5, {"Gl"}, "Tagesgericht")
+        restored = pickle.loads(pickle.dumps(dish))
+        self.assertEqual(dish, restored)
+        self.assertEqual(hash(dish), hash(restored))
+        menu = Menu(date(2017, 11, 6), [dish])
+        self.assertEqual(menu, pickle.loads(pickle.dumps(menu)))
+
+    def test_Should_ParseIngredients_When_CreatedFromMarkers(self):
+        dish = Dish.from_markers("Gulasch", 1.9, "mensa-garching", ["Mi,Gl", "", "S"], "Tagesgericht")
+        self.assertEqual(Dish("Gulasch", 1.9, {"Mi", "Gl", "S"}, "Tagesgericht"), dish)
+        # the codes of the mediziner mensa are mapped to the common ones
+        self.assertEqual({"Gl", "Mi"}, Dish.from_markers("Nudeln", 2, "mediziner-mensa", ["B,N"], "Suppe").ingredients)
+
+
+class MenuTest(unittest.TestCase):
+
+    def test_Should_ReturnNewMenu_When_RemovingDuplicates(self):
+        pasta = Dish("Pasta", 2.5, {"Gl"}, "Tagesgericht")
+        soup = Dish("Suppe", 1, {"Sl"}, "Tagesgericht")
+        menu = Menu(date(2017, 11, 6), [pasta, soup, Dish("Pasta", 2.5, {"Gl"}, "Tagesgericht")])
+
+        unique = menu.remove_duplicates()
+        self.assertEqual((pasta, soup), unique.dishes)
+        self.assertEqual(3, len(menu.dishes))
+        # dishes are compared regardless of their order
+        self.assertEqual(unique, Menu(date(2017, 11, 6), [soup, pasta]))
+        self.assertNotEqual(unique, Menu(date(2017, 11, 7), [pasta, soup]))
+
+
+class CalendarIndexTest(unittest.TestCase):
+
+    @staticmethod
+    def menu(menu_date, name="Pasta"):
+        return Menu(menu_date, [Dish(name, 2.5, {"Gl"}, "Tagesgericht")])
+
+    def test_Should_KeyWeeksByIsoYearAndWeek(self):
+        menus = [self.menu(date(2021, 1, 4)), self.menu(date(2020, 12, 31)), self.menu(date(2021, 1, 1)),
+                 self.menu(date(2018, 12, 31)), self.menu(date(2019, 12, 31))]
+        calendar = CalendarIndex(menus)
+
+        self.assertEqual([(2019, 1), (2020, 1), (2020, 53), (2021, 1)], list(calendar))
+        # 2018-12-31 belongs to the first week of 2019, which no longer collides with the first week of 2020
+        self.assertEqual([date(2018, 12, 31)], [menu.menu_date for menu in calendar.week(2019, 1).days])
+        self.assertEqual([date(2019, 12, 31)], [menu.menu_date for menu in calendar[(2020, 1)].days])
+        # days are sorted by date
+        self.assertEqual([date(2020, 12, 31), date(2021, 1, 1)], [menu.menu_date for menu in calendar[(2020, 53)].days])
+        self.assertEqual(53, calendar[(2020, 53)].calendar_week)
+        self.assertEqual(2020, calendar[(2020, 53)].year)
+        self.assertIsNone(calendar.week(2020, 52))
+
+    def test_Should_FindMenusByDate(self):
+        calendar = CalendarIndex({menu.menu_date: menu for menu in
+                                  [self.menu(date(2017, 11, day)) for day in (10, 6, 8, 7, 9)]})
+        self.assertEqual([date(2017, 11, 7), date(2017, 11, 8)],
+                         [menu.menu_date for menu in calendar.between(date(2017, 11, 7), date(2017, 11, 8))])
+        self.assertEqual([], calendar.between(date(2017, 11, 11), date(2017, 11, 30)))
+        self.assertEqual(self.menu(date(2017, 11, 9)), calendar.menu(date(2017, 11, 9)))
+        self.assertIsNone(calendar.menu(date(2017, 11, 11)))
+        self.assertIsNone(calendar.today())
+
+    def test_Should_ReplaceMenu_When_InsertingSameDate(self):
+        calendar = CalendarIndex([self.menu(date(2017, 11, 6))])
+        calendar.insert(self.menu(date(2017, 11, 6), "Pizza"))
+        self.assertEqual(1, len(calendar.menus()))
+        self.assertEqual([self.menu(date(2017, 11, 6), "Pizza")], calendar[(2017, 45)].days)
+
+    def test_Should_KeyByWeekNumber_When_ConvertingToWeeks(self):
+        weeks = Week.to_weeks({date(2017, 11, 6): self.menu(date(2017, 11, 6))})
+        self.assertEqual([45], list(weeks))
+        self.assertEqual(2017, weeks[45].year)
+
+
+class IngredientsTest(unittest.TestCase):
+
+    def test_Should_NormalizeCodesOfLocation(self):
+        ingredients = Ingredients("mediziner-mensa")
+        ingredients.parse_ingredients("B,N")
+        ingredients.parse_ingredients(" 3,V")
+        self.assertEqual({"Gl", "Mi", "3", "Sw"}, ingredients.ingredient_set)
+        # a missing ',' between the codes
+        ingredients = Ingredients("ipp-bistro")
+        ingredients.parse_ingredients("Mi,GlSf")
+        self.assertEqual({"Mi", "Gl", "Sf"}, ingredients.ingredient_set)
+
+    def test_Should_ReuseResult_When_ParsingSameString(self):
+        first = Ingredients.parse_cached("studentenwerk", "Mi,Gl,Sf,Sl,Ei,Se,4")
+        self.assertIs(first, Ingredients.parse_cached("studentenwerk", "Mi,Gl,Sf,Sl,Ei,Se,4"))
+        self.assertEqual(({"Mi", "Gl", "Sf", "Sl", "Ei", "Se", "4"}, ()), first)
+
+    def test_Should_CountUnknownCodes(self):
+        Ingredients.pop_unknown_codes()
+        for _ in range(3):
+            Ingredients("mensa-garching").parse_ingredients("Mi,42")
+        Ingredients("fmi-bistro").parse_ingredients("Gluten,Zucker")
+        self.assertEqual({("mensa-garching", "42"): 3, ("fmi-bistro", "Zucker"): 1}, Ingredients.pop_unknown_codes())
+        self.assertEqual({}, Ingredients.pop_unknown_codes())
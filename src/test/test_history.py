@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import unittest
+from datetime import date
+
+import main
+from entities import CalendarIndex, Dish, Menu
+from history import HistoryStore
+from output import AtomicOutput, JsonWriter
+
+
+class HistoryStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.history_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.history_dir.cleanup()
+
+    @staticmethod
+    def weeks(*days, name="Pasta"):
+        return CalendarIndex([Menu(date(2017, 11, day), [Dish(name, 2.5, {"Gl"}, "Tagesgericht")]) for day in days])
+
+    def test_Should_AppendOnlyNewOrChangedDays_When_Merging(self):
+        history = HistoryStore(self.history_dir.name)
+        self.assertEqual(3, history.merge(self.weeks(6, 7, 8)))
+        self.assertEqual(0, history.merge(self.weeks(7, 8)))
+        self.assertEqual(1, history.merge(self.weeks(8, name="Pizza")))
+        # the history survives a restart
+        history = HistoryStore(self.history_dir.name)
+        self.assertEqual(1, history.merge(self.weeks(13)))
+        self.assertEqual(5, history.records)
+
+        self.assertEqual(["2017-11-06", "2017-11-07", "2017-11-08", "2017-11-13"],
+                         [record["date"] for record in history.iter_days()])
+        self.assertEqual("Pizza", list(history.iter_days())[2]["dishes"][0]["name"])
+
+    def test_Should_ExportCombinedFormat_When_ConvertedToJson(self):
+        history = HistoryStore(self.history_dir.name)
+        history.merge(self.weeks(13))
+        history.merge(self.weeks(6, 7))
+        expected = {"canteen_id": "mensa-garching",
+                    "weeks": [week.to_json_obj() for week in self.weeks(6, 7, 13).values()]}
+        self.assertEqual(expected, history.to_json_obj("mensa-garching"))
+
+    def test_Should_DropSupersededRecords_When_Compacted(self):
+        history = HistoryStore(self.history_dir.name, segment_size=1)
+        history.merge(self.weeks(6, 7))
+        history.merge(self.weeks(6, 7, name="Pizza"))
+        history.merge(self.weeks(6, 7, name="Reis"))
+        # the superseded records outnumbered the current ones after the last merge
+        self.assertEqual(2, history.records)
+        self.assertEqual(["segment-000006.jsonl", "segment-000007.jsonl"], history.segments)
+        self.assertEqual(sorted(history.segments + [HistoryStore.index_name]), sorted(os.listdir(self.history_dir.name)))
+        self.assertEqual(["Reis", "Reis"], [record["dishes"][0]["name"] for record in
+                                            HistoryStore(self.history_dir.name).iter_days()])
+
+    def test_Should_CompressCombinedFile_When_HistoryIsUnchanged(self):
+        with tempfile.TemporaryDirectory() as json_dir:
+            history = HistoryStore(self.history_dir.name)
+            main.jsonify(self.weeks(6), json_dir, "mensa-garching", True, JsonWriter(), history)
+            combined_path = os.path.join(json_dir, "combined", "combined.json")
+            self.assertFalse(os.path.exists(combined_path + ".gz"))
+
+            # the next run enables precompression, but does not change the history
+            main.jsonify(self.weeks(6), json_dir, "mensa-garching", True,
+                         JsonWriter(output=AtomicOutput(precompress=True)), history)
+            self.assertTrue(os.path.exists(combined_path + ".gz"))
+            self.assertTrue(os.path.exists(os.path.join(json_dir, "2017", "45.json.gz")))
+
+
+if __name__ == '__main__':
+    unittest.main()
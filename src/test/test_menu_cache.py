@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+import glob
+import os
+import tempfile
+import unittest
+
+from menu_cache import MenuCache, get_code_version
+from menu_parser import StudentenwerkMenuParser
+
+
+class FakeTransport:
+    def __init__(self, path):
+        with open(path, "rb") as page:
+            self.page = page.read()
+
+    def fetch(self, url):
+        return self.page
+
+
+class MenuCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.transport = FakeTransport("src/test/assets/studentenwerk/in/speiseplan_mensa_arcisstrasse.html")
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+
+    def test_Should_ReturnCachedMenus_When_InputIsUnchanged(self):
+        cache = MenuCache(self.cache_dir.name)
+        menus = StudentenwerkMenuParser(self.transport, menu_cache=cache).parse("mensa-arcisstr")
+        cached_menus = StudentenwerkMenuParser(self.transport, menu_cache=cache).parse("mensa-arcisstr")
+
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+        self.assertEqual(menus, cached_menus)
+        self.assertEqual([menu.dishes for menu in menus.values()], [menu.dishes for menu in cached_menus.values()])
+
+        # the location is part of the key
+        StudentenwerkMenuParser(self.transport, menu_cache=cache).parse("mensa-arcisstrasse")
+        self.assertEqual((1, 2), (cache.hits, cache.misses))
+
+    def test_Should_Invalidate_When_CodeVersionChanges(self):
+        StudentenwerkMenuParser(self.transport, menu_cache=MenuCache(self.cache_dir.name)).parse("mensa-arcisstr")
+        cache = MenuCache(self.cache_dir.name, version=get_code_version() + "-changed")
+        StudentenwerkMenuParser(self.transport, menu_cache=cache).parse("mensa-arcisstr")
+        self.assertEqual((0, 1), (cache.hits, cache.misses))
+
+    def test_Should_DeleteEntriesOfOtherVersions_When_Opened(self):
+        StudentenwerkMenuParser(self.transport, menu_cache=MenuCache(self.cache_dir.name, version="1")).parse(
+            "mensa-arcisstr")
+        StudentenwerkMenuParser(self.transport, menu_cache=MenuCache(self.cache_dir.name, version="2")).parse(
+            "mensa-arcisstr")
+        self.assertEqual(1, len(os.listdir(self.cache_dir.name)))
+        self.assertEqual(1, len(glob.glob(os.path.join(self.cache_dir.name, "*", "*.pickle.z"))))
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import asyncio
 import os
 import tempfile
 import unittest
@@ -11,6 +12,45 @@ from menu_parser import MenuParser, StudentenwerkMenuParser, FMIBistroMenuParser
     MedizinerMensaMenuParser
 from entities import Dish, Menu, Week
 import json
+from transport import iter_chunks
+
+
+class FakeTransport:
+    """Serves the given responses instead of fetching them from the web."""
+
+    def __init__(self, responses):
+        self.responses = responses
+
+    def fetch(self, url):
+        return self.responses[url]
+
+    def stream(self, url, chunk_size=64 * 1024):
+        return iter_chunks(self.responses[url], chunk_size)
+
+
+class FakeAsyncTransport(FakeTransport):
+
+    async def fetch(self, url):
+        return self.responses[url]
+
+
+class FakePdfExtractor:
+    """Treats the "PDFs" as already extracted text."""
+    cache = None
+
+    def extract(self, pdf, first_page=None, last_page=None):
+        return pdf.decode("utf-8")
+
+    async def extract_async(self, pdf, first_page=None, last_page=None):
+        return pdf.decode("utf-8")
+
+
+def run_async(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
 
 
 class MenuParserTest(unittest.TestCase):
@@ -93,6 +133,33 @@ class StudentenwerkMenuParserTest(unittest.TestCase):
                 with open("src/test/assets/studentenwerk/out/speiseplan_mensa_arcisstrasse.json", "r") as reference:
                     self.assertEqual(json.load(generated), json.load(reference))
 
+    def test_Should_ParseAsync_LikeParse(self):
+        with open("src/test/assets/studentenwerk/in/speiseplan_mensa_arcisstrasse.html", "rb") as page:
+            responses = {StudentenwerkMenuParser.base_url.format(421): page.read()}
+        parser = StudentenwerkMenuParser(FakeTransport(responses))
+
+        menus = run_async(parser.parse_async("mensa-arcisstr", FakeAsyncTransport(responses)))
+        self.assertEqual(parser.parse("mensa-arcisstr"), menus)
+        self.assertIsNone(run_async(parser.parse_async("unknown", FakeAsyncTransport(responses))))
+
+    def test_Should_ParseIncrementally_When_Streaming(self):
+        with open("src/test/assets/studentenwerk/in/speiseplan_stubistro_großhadern.html", "rb") as page:
+            responses = {StudentenwerkMenuParser.base_url.format(414): page.read()}
+        parser = StudentenwerkMenuParser(FakeTransport(responses))
+        expected = parser.parse("stubistro-grosshadern")
+
+        # the menus are emitted in the order of the page, no matter how the page is split into chunks
+        streamed = list(parser.stream_menus("stubistro-grosshadern", chunk_size=100))
+        self.assertEqual(list(expected.values()), streamed)
+        self.assertEqual(expected, StudentenwerkMenuParser(FakeTransport(responses), streaming=True).parse(
+            "stubistro-grosshadern"))
+
+    def test_Should_ShareFetchKey_When_LocationsAreAliases(self):
+        parser = self.studentenwerk_menu_parser
+        self.assertEqual(parser.get_fetch_key("mensa-arcisstr"), parser.get_fetch_key("mensa-arcisstrasse"))
+        self.assertEqual(parser.get_fetch_key("stubistro-großhadern"), parser.get_fetch_key("stubistro-grosshadern"))
+        self.assertNotEqual(parser.get_fetch_key("mensa-arcisstr"), parser.get_fetch_key("mensa-garching"))
+
     def test_Should_IgnoreDay_When_DateOfTheDayIsInAWrongFormat(self):
         self.assertEqual(22, len(
             self.studentenwerk_menu_parser.get_menus(self.menu_html_mensa_garching_old_wrong_date_format, "mensa-garching")))
@@ -199,6 +266,24 @@ class FMIBistroParserTest(unittest.TestCase):
                     self.assertEqual(json.load(generated), json.load(reference))
 
 
+    def test_Should_MergeWeeksInOrder_When_ParsingPdfsInParallel(self):
+        responses = {FMIBistroMenuParser.url: b'<html><body>'
+                                              b'<a href="http://a/Garching-KW44_2017.pdf">KW 44</a>'
+                                              b'<a href="http://a/Garching-KW45_2017.pdf">KW 45</a></body></html>',
+                     "http://a/Garching-KW44_2017.pdf": self.menu_kw_44_2017_txt.encode("utf-8"),
+                     "http://a/Garching-KW45_2017.pdf": self.menu_kw_45_2017_txt.encode("utf-8")}
+
+        sequential = FMIBistroMenuParser(FakeTransport(responses), FakePdfExtractor(), pdf_workers=1)
+        parallel = FMIBistroMenuParser(FakeTransport(responses), FakePdfExtractor(), pdf_workers=2)
+        menus = parallel.parse("fmi-bistro")
+
+        self.assertEqual(sequential.parse("fmi-bistro"), menus)
+        self.assertEqual(menus, run_async(sequential.parse_async("fmi-bistro", FakeAsyncTransport(responses))))
+        self.assertEqual(list(self.bistro_parser.get_menus(self.menu_kw_44_2017_txt, 2017, 44).values())
+                         + list(self.bistro_parser.get_menus(self.menu_kw_45_2017_txt, 2017, 45).values()),
+                         list(menus.values()))
+
+
 class IPPBistroParserTest(unittest.TestCase):
     ipp_parser = IPPBistroMenuParser()
 
@@ -347,6 +432,15 @@ class MedizinerMensaParserTest(unittest.TestCase):
                 with open("src/test/assets/mediziner-mensa/out/menu_kw_47_2018.json", "r") as reference:
                     self.assertEqual(json.load(generated), json.load(reference))
 
+    def test_Should_SeparateIngredientsAndPrice_When_ParsingDish(self):
+        dish = self.mediziner_mensa_parser.parse_dish("Chili con Cous Cous B mit Kürbis-Apfel-Salat 3,9,V 2,15 €")
+        self.assertEqual("Chili con Cous Cous mit Kürbis-Apfel-Salat ", dish.name)
+        self.assertEqual(2.15, dish.price)
+        self.assertEqual({"Gl", "3", "9", "Sw"}, dish.ingredients)
+        # a code at the very beginning is part of the name
+        self.assertEqual("B Suppe", self.mediziner_mensa_parser.parse_dish("B Suppe N").name)
+        self.assertEqual("Suppe", self.mediziner_mensa_parser.parse_dish(" B Suppe N").name)
+
     """
     # just for generating reference json files
     def test_genFile(self):
@@ -1,8 +1,10 @@
+import io
 from unittest import TestCase
+from lxml import etree
 from pyopenmensa.feed import LazyBuilder
 from datetime import date
 from menu_parser import FMIBistroMenuParser
-from entities import Dish, Menu, Week
+from entities import CalendarIndex, Dish, Menu, Week
 import openmensa
 
 class OpenMensaTest(TestCase):
@@ -61,4 +63,23 @@ class OpenMensaTest(TestCase):
         self.assertEqual(canteen_wed2[0], ("Pochiertes Lachsfilet mit Dillsoße dazu Minze-Reis", [], {'other': 650}))
         self.assertEqual(canteen_wed2[1], ("Spaghetti al Pomodoro", [], {'other': 360}))
         self.assertEqual(canteen_wed2[2], ("Krustenbraten vom Schwein mit Kartoffelknödel und Krautsalat", [], {'other': 530}))
-        
+
+    def test_Should_StreamFeedWithCategoriesAndNotes_When_WritingFeed(self):
+        menu = Menu(date(2017, 3, 27), [Dish("Kartoffelgulasch", 1, set(["f"]), "Tagesgericht 1"),
+                                        Dish("Salatbar", "0.68€ / 100g", set(), "Self-Service"),
+                                        Dish("Nudeln", "3.60", set(), "Tagesgericht 1"),
+                                        Dish("Überraschungsmenü", "?", set(), "")])
+        outfile = io.BytesIO()
+        openmensa.writeFeed(CalendarIndex([menu, Menu(date(2017, 3, 28), [])]), outfile)
+
+        root = etree.fromstring(outfile.getvalue())
+        self.assertEqual("2.1", root.get("version"))
+        days = root.findall("{%s}canteen/{%s}day" % (openmensa.namespace, openmensa.namespace))
+        # days without dishes are left out
+        self.assertEqual(["2017-03-27"], [day.get("date") for day in days])
+        meals = [(category.get("name"), [(child.tag.split("}")[1], child.text) for child in meal])
+                 for category in days[0] for meal in category]
+        self.assertEqual([("Tagesgericht 1", [("name", "Kartoffelgulasch"), ("price", "1.00")]),
+                          ("Tagesgericht 1", [("name", "Nudeln"), ("price", "3.60")]),
+                          ("Self-Service", [("name", "Salatbar"), ("note", "0.68€ / 100g")]),
+                          ("Speiseplan", [("name", "Überraschungsmenü")])], meals)
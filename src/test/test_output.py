@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+import gzip
+import json
+import os
+import tempfile
+import unittest
+
+from output import AtomicOutput, JsonWriter, get_compressors
+
+
+class JsonWriterTest(unittest.TestCase):
+    obj = {"canteen_id": "mensa-garching", "weeks": [{"number": 13, "price": 1.9, "name": "Hackfleischbällchen"}]}
+
+    def setUp(self):
+        self.output_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.output_dir.name, "13.json")
+
+    def tearDown(self):
+        self.output_dir.cleanup()
+
+    def read(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def test_Should_WriteIndentedJson_When_NotCompact(self):
+        JsonWriter().write(self.path, self.obj)
+        self.assertEqual(json.dumps(self.obj, indent=4, ensure_ascii=False).encode("utf-8"), self.read())
+
+    def test_Should_OmitWhitespace_When_Compact(self):
+        JsonWriter(compact=True).write(self.path, self.obj)
+        self.assertNotIn(b"\n", self.read())
+        self.assertEqual(self.obj, json.loads(self.read().decode("utf-8")))
+
+    def test_Should_UseEncoder_When_Given(self):
+        JsonWriter(compact=True, encoder=lambda obj: b"[]").write(self.path, self.obj)
+        self.assertEqual(b"[]", self.read())
+
+
+class AtomicOutputTest(unittest.TestCase):
+
+    def setUp(self):
+        self.output_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.output_dir.name, "feed.xml")
+
+    def tearDown(self):
+        self.output_dir.cleanup()
+
+    def write(self, output, content):
+        with output.open(self.path) as outfile:
+            outfile.write(content)
+
+    def test_Should_SkipWrite_When_ContentIsUnchanged(self):
+        output = AtomicOutput()
+        self.write(output, "<feed/>")
+        os.utime(self.path, (0, 0))
+        self.write(output, "<feed/>")
+        self.assertEqual(0, os.stat(self.path).st_mtime)
+        self.write(output, "<feed>new</feed>")
+        self.assertNotEqual(0, os.stat(self.path).st_mtime)
+
+        self.assertEqual(2, output.written)
+        self.assertEqual(1, output.unchanged)
+        self.assertEqual(0o644, os.stat(self.path).st_mode & 0o777)
+        self.assertEqual(["feed.xml"], os.listdir(self.output_dir.name))
+
+    def test_Should_KeepOldFile_When_WritingFails(self):
+        output = AtomicOutput()
+        self.write(output, "<feed/>")
+        with self.assertRaises(ValueError):
+            with output.open(self.path) as outfile:
+                outfile.write("<feed>")
+                raise ValueError()
+        with open(self.path) as f:
+            self.assertEqual("<feed/>", f.read())
+        self.assertEqual(["feed.xml"], os.listdir(self.output_dir.name))
+
+    def test_Should_RecompressOnlyChangedFiles_When_Precompressing(self):
+        output = AtomicOutput(precompress=True, compress_level=1)
+        self.write(output, "<feed/>")
+        suffixes = [suffix for suffix, _ in get_compressors()]
+        self.assertEqual(sorted(["feed.xml"] + ["feed.xml" + suffix for suffix in suffixes]),
+                         sorted(os.listdir(self.output_dir.name)))
+        with gzip.open(self.path + ".gz", "rt") as f:
+            self.assertEqual("<feed/>", f.read())
+
+        # a copy newer than its unchanged file is kept
+        os.utime(self.path, (0, 0))
+        os.utime(self.path + ".gz", (1, 1))
+        self.write(output, "<feed/>")
+        self.assertEqual(1, os.stat(self.path + ".gz").st_mtime)
+        # missing copies of unchanged files are written as well
+        os.unlink(self.path + ".gz")
+        self.write(output, "<feed/>")
+        self.write(output, "<feed>new</feed>")
+        with gzip.open(self.path + ".gz", "rt") as f:
+            self.assertEqual("<feed>new</feed>", f.read())
+        self.assertEqual(len(suffixes) + 2, output.compressed)
+
+    def test_Should_Recompress_When_CopyIsOlderThanFile(self):
+        self.write(AtomicOutput(precompress=True), "old")
+        os.utime(self.path + ".gz", (0, 0))
+        # written by a run without precompress
+        self.write(AtomicOutput(), "new")
+        self.write(AtomicOutput(precompress=True), "new")
+        with gzip.open(self.path + ".gz", "rt") as f:
+            self.assertEqual("new", f.read())
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import warnings
+from unittest import mock
+
+from main import run_async
+from pdf import PdfTextCache, PdfTextExtractor
+
+
+def make_pdf(pages):
+    """Builds a minimal PDF document with one line of text per page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>",
+               "<< /Type /Pages /Kids [%s] /Count %d >>" % (
+                   " ".join("%d 0 R" % (4 + 2 * i) for i in range(len(pages))), len(pages)),
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    for i, text in enumerate(pages):
+        stream = "BT /F1 12 Tf 72 720 Td (%s) Tj ET" % text
+        objects.append("<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+                       "/Resources << /Font << /F1 3 0 R >> >> >>" % (5 + 2 * i))
+        objects.append("<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+
+    pdf = "%PDF-1.4\n"
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += "%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref = len(pdf)
+    pdf += "xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += "".join("%010d 00000 n \n" % offset for offset in offsets)
+    pdf += "trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return pdf.encode("latin-1")
+
+
+class PdfTextExtractorTest(unittest.TestCase):
+
+    def test_Should_BuildPageRangeArguments(self):
+        self.assertEqual(["-layout"], PdfTextExtractor.get_args())
+        self.assertEqual(["-layout", "-l", "1"], PdfTextExtractor.get_args(last_page=1))
+        self.assertEqual(["-layout", "-f", "2", "-l", "3"], PdfTextExtractor.get_args(2, 3))
+
+    @unittest.skipIf(shutil.which("pdftotext") is None, "pdftotext is not installed")
+    def test_Should_ExtractText_When_PipingPdf(self):
+        extractor = PdfTextExtractor(timeout=10)
+        pdf = make_pdf(["Montag Dienstag", "Seite zwei"])
+
+        text = extractor.extract(pdf)
+        self.assertIn("Montag Dienstag", text)
+        self.assertIn("Seite zwei", text)
+
+        first_page = extractor.extract(pdf, last_page=1)
+        self.assertIn("Montag Dienstag", first_page)
+        self.assertNotIn("Seite zwei", first_page)
+
+        self.assertEqual([first_page, first_page], extractor.extract_many([pdf, pdf], last_page=1))
+
+    @unittest.skipIf(shutil.which("pdftotext") is None, "pdftotext is not installed")
+    def test_Should_Raise_When_InputIsNoPdf(self):
+        with self.assertRaises(subprocess.CalledProcessError):
+            PdfTextExtractor(timeout=10).extract(b"no pdf")
+
+
+@unittest.skipIf(sys.platform == "win32", "the pdftotext stub is a shell script")
+class AsyncPdfTextExtractorTest(unittest.TestCase):
+
+    def setUp(self):
+        # a stub pdftotext which copies its input to its output
+        self.bin_dir = tempfile.TemporaryDirectory()
+        stub_path = os.path.join(self.bin_dir.name, "pdftotext")
+        with open(stub_path, "w") as stub:
+            stub.write("#!/bin/sh\ncat\n")
+        os.chmod(stub_path, 0o755)
+        path_patch = mock.patch.dict(os.environ, {"PATH": self.bin_dir.name + os.pathsep + os.environ["PATH"]})
+        path_patch.start()
+        self.addCleanup(path_patch.stop)
+
+        # before Python 3.8 the default child watcher only works on the loop which is set as current loop
+        self.policy = asyncio.get_event_loop_policy()
+        self.watcher = None
+        if hasattr(asyncio, "SafeChildWatcher"):
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", DeprecationWarning)
+                self.watcher = asyncio.SafeChildWatcher()
+                self.policy.set_child_watcher(self.watcher)
+
+    def tearDown(self):
+        if self.watcher is not None:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", DeprecationWarning)
+                self.policy.set_child_watcher(None)
+                self.watcher.close()
+        self.bin_dir.cleanup()
+
+    def test_Should_RunPdftotext_When_DrivenLikeMain(self):
+        extractor = PdfTextExtractor(timeout=10)
+        self.assertEqual("Montag Dienstag", run_async(extractor.extract_async(b"Montag Dienstag", last_page=1)))
+
+
+class CountingExtractor(PdfTextExtractor):
+    """Does not call pdftotext but counts the conversions."""
+
+    def __init__(self, cache):
+        super().__init__(cache=cache)
+        self.conversions = 0
+
+    def _run_pdftotext(self, pdf, args):
+        self.conversions += 1
+        return "%s %s" % (pdf.decode("utf-8"), " ".join(args))
+
+
+class PdfTextCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+
+    def test_Should_SkipPdftotext_When_PdfIsUnchanged(self):
+        cache = PdfTextCache(self.cache_dir.name)
+        extractor = CountingExtractor(cache)
+
+        self.assertEqual("KW45 -layout", extractor.extract(b"KW45"))
+        self.assertEqual("KW45 -layout", extractor.extract(b"KW45"))
+        # different arguments and different bytes are different entries
+        self.assertEqual("KW45 -layout -l 1", extractor.extract(b"KW45", last_page=1))
+        self.assertEqual("KW46 -layout", extractor.extract(b"KW46"))
+
+        self.assertEqual(3, extractor.conversions)
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(3, cache.misses)
+        # the cache survives the process
+        self.assertEqual("KW45 -layout", CountingExtractor(PdfTextCache(self.cache_dir.name)).extract(b"KW45"))
+
+    def test_Should_EvictLeastRecentlyUsed_When_CacheIsFull(self):
+        cache = PdfTextCache(self.cache_dir.name, max_size=25)
+        cache.put("a", "0123456789")
+        cache.put("b", "0123456789")
+        # make "a" the most recently used entry
+        old = time.time() - 60
+        os.utime(os.path.join(self.cache_dir.name, "b.txt"), (old, old))
+        self.assertEqual("0123456789", cache.get("a"))
+        cache.put("c", "0123456789")
+
+        self.assertEqual("0123456789", cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual("0123456789", cache.get("c"))
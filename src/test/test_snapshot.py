@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import unittest
+from datetime import date
+
+from entities import Dish, Menu
+from output import AtomicOutput
+from snapshot import SnapshotReader, write_snapshot
+
+
+class SnapshotTest(unittest.TestCase):
+    salad = Dish("Salatteller", "0.68€ / 100g", {"v"}, "Self-Service")
+    curry = Dish("Gemüsecurry", 1.55, {"v", "Sl"}, "Tagesgericht 3")
+    schnitzel = Dish("Schweineschnitzel", 3.5, {"S", "Gl", "Ei"}, "Aktionsessen 8")
+    menus = {
+        "mensa-garching": {date(2017, 11, 13): Menu(date(2017, 11, 13), [salad]),
+                           date(2017, 11, 6): Menu(date(2017, 11, 6), [schnitzel, curry]),
+                           date(2017, 11, 7): Menu(date(2017, 11, 7), [curry])},
+        "fmi-bistro": [Menu(date(2017, 11, 6), [curry, salad])],
+        "ipp-bistro": [],
+    }
+
+    def setUp(self):
+        self.snapshot_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.snapshot_dir.name, "menus.snapshot")
+
+    def tearDown(self):
+        self.snapshot_dir.cleanup()
+
+    def test_Should_ReadMenus_When_SnapshotWasWritten(self):
+        write_snapshot(self.path, self.menus)
+        with SnapshotReader(self.path) as reader:
+            self.assertEqual(["fmi-bistro", "ipp-bistro", "mensa-garching"], reader.locations())
+            self.assertEqual(Menu(date(2017, 11, 6), [self.schnitzel, self.curry]),
+                             reader.menu("mensa-garching", date(2017, 11, 6)))
+            self.assertEqual([self.schnitzel, self.curry],
+                             list(reader.menu("mensa-garching", date(2017, 11, 6)).dishes))
+            self.assertEqual([self.curry, self.salad], list(reader.menu("fmi-bistro", date(2017, 11, 6)).dishes))
+            self.assertIsNone(reader.menu("mensa-garching", date(2017, 11, 8)))
+            self.assertIsNone(reader.menu("ipp-bistro", date(2017, 11, 6)))
+            self.assertIsNone(reader.menu("mensa-arcisstr", date(2017, 11, 6)))
+            self.assertEqual([date(2017, 11, 6), date(2017, 11, 7), date(2017, 11, 13)],
+                             reader.dates("mensa-garching"))
+            self.assertEqual(["0.68€ / 100g"], [dish.price for menu in reader.menus("mensa-garching")
+                                                for dish in menu.dishes if dish.name == "Salatteller"])
+
+    def test_Should_KeepFile_When_SnapshotIsUnchanged(self):
+        output = AtomicOutput()
+        write_snapshot(self.path, self.menus, output)
+        write_snapshot(self.path, self.menus, output)
+        self.assertEqual((1, 1), (output.written, output.unchanged))
+
+    def test_Should_Raise_When_FileIsNoSnapshot(self):
+        with open(self.path, "wb") as f:
+            f.write(b"\0" * 64)
+        with self.assertRaises(ValueError):
+            SnapshotReader(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
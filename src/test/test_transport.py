@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import requests
+from lxml import html
+
+import menu_parser
+from transport import CachingTransport, RecordingTransport, ReplayTransport, Transport
+
+replay_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "replay")
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    # http.server.ThreadingHTTPServer is not available before Python 3.7
+    daemon_threads = True
+
+
+class RecordingHandler(BaseHTTPRequestHandler):
+    # keep connections alive between requests
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers), self.client_address))
+        status, headers, body = self.server.responses.get(self.path, (404, {}, b"not found"))
+        if headers.get("ETag") and self.headers.get("If-None-Match") == headers["ETag"]:
+            status, body = 304, b""
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalServerTestCase(unittest.TestCase):
+    """Runs a local HTTP server which answers with `self.server.responses` and records every request."""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), RecordingHandler)
+        self.server.requests = []
+        self.server.responses = {}
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def url(self, path):
+        return "http://127.0.0.1:%d%s" % (self.server.server_address[1], path)
+
+
+class TransportTest(LocalServerTestCase):
+
+    def test_Should_ReuseConnection_When_FetchingFromSameHost(self):
+        self.server.responses["/a"] = (200, {}, b"page a")
+        self.server.responses["/b"] = (200, {}, b"page b")
+        transport = Transport(pool_size=2, max_per_host=1, timeout=5)
+
+        self.assertEqual(b"page a", transport.fetch(self.url("/a")))
+        self.assertEqual(b"page b", transport.fetch(self.url("/b")))
+        transport.close()
+
+        # both requests were sent over the same client socket
+        self.assertEqual(1, len(set(client_address for _, _, client_address in self.server.requests)))
+
+    def test_Should_YieldChunks_When_Streaming(self):
+        self.server.responses["/page"] = (200, {}, b"0123456789")
+        transport = Transport(timeout=5)
+        self.assertEqual([b"0123", b"4567", b"89"], list(transport.stream(self.url("/page"), chunk_size=4)))
+        transport.close()
+
+    def test_Should_Raise_When_StatusIsAnError(self):
+        transport = Transport(timeout=5)
+        with self.assertRaises(requests.HTTPError):
+            transport.fetch(self.url("/missing"))
+        transport.close()
+
+    def test_Should_LimitConcurrency_PerHost(self):
+        transport = Transport(max_per_host=3)
+        limit = transport._host_limit("http://www.studentenwerk-muenchen.de/a.html")
+        self.assertIs(limit, transport._host_limit("http://www.studentenwerk-muenchen.de/b.html"))
+        self.assertIsNot(limit, transport._host_limit("http://www.wilhelm-gastronomie.de/"))
+        for _ in range(3):
+            self.assertTrue(limit.acquire(blocking=False))
+        self.assertFalse(limit.acquire(blocking=False))
+
+
+class CachingTransportTest(LocalServerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.transport = Transport(timeout=5)
+
+    def tearDown(self):
+        self.transport.close()
+        self.cache_dir.cleanup()
+        super().tearDown()
+
+    def test_Should_ReuseCachedBody_When_NotModified(self):
+        self.server.responses["/menu.pdf"] = (200, {"ETag": '"v1"', "Last-Modified": "Mon, 06 Nov 2017 08:00:00 GMT"},
+                                              b"%PDF week 45")
+        self.assertEqual(b"%PDF week 45", CachingTransport(self.transport, self.cache_dir.name).fetch(
+            self.url("/menu.pdf")))
+        # a new cache instance (i.e. the next run) revalidates the stored entry
+        self.assertEqual(b"%PDF week 45", CachingTransport(self.transport, self.cache_dir.name).fetch(
+            self.url("/menu.pdf")))
+
+        self.assertEqual(2, len(self.server.requests))
+        self.assertNotIn("If-None-Match", self.server.requests[0][1])
+        self.assertEqual('"v1"', self.server.requests[1][1]["If-None-Match"])
+        self.assertEqual("Mon, 06 Nov 2017 08:00:00 GMT", self.server.requests[1][1]["If-Modified-Since"])
+
+    def test_Should_TouchEntryInsteadOfRewriting_When_NotModified(self):
+        self.server.responses["/menu.pdf"] = (200, {"ETag": '"v1"'}, b"%PDF week 45")
+        cache = CachingTransport(self.transport, self.cache_dir.name, max_age=3600)
+        cache.fetch(self.url("/menu.pdf"))
+        path = cache._path(self.url("/menu.pdf"))
+        os.utime(path, (0, 0))
+        before = os.stat(path)
+
+        self.assertEqual(b"%PDF week 45", cache.fetch(self.url("/menu.pdf")))
+        after = os.stat(path)
+        self.assertEqual(before.st_ino, after.st_ino)
+        self.assertEqual(before.st_size, after.st_size)
+        self.assertGreater(after.st_mtime, 0)
+        # the validation has been recorded, so the next fetch does not hit the network
+        self.assertEqual(b"%PDF week 45", cache.fetch(self.url("/menu.pdf")))
+        self.assertEqual(2, len(self.server.requests))
+
+    def test_Should_UpdateCache_When_Modified(self):
+        cache = CachingTransport(self.transport, self.cache_dir.name)
+        self.server.responses["/menu.html"] = (200, {"ETag": '"v1"'}, b"old")
+        self.assertEqual(b"old", cache.fetch(self.url("/menu.html")))
+        self.server.responses["/menu.html"] = (200, {"ETag": '"v2"'}, b"new")
+        self.assertEqual(b"new", cache.fetch(self.url("/menu.html")))
+        self.server.responses["/menu.html"] = (200, {"ETag": '"v2"'}, b"not sent")
+        self.assertEqual(b"new", cache.fetch(self.url("/menu.html")))
+
+    def test_Should_SkipNetwork_When_EntryIsFresh(self):
+        self.server.responses["/menu.html"] = (200, {}, b"menu")
+        CachingTransport(self.transport, self.cache_dir.name).fetch(self.url("/menu.html"))
+        cache = CachingTransport(self.transport, self.cache_dir.name, max_age=3600)
+        self.assertEqual(b"menu", cache.fetch(self.url("/menu.html")))
+        self.assertEqual(1, len(self.server.requests))
+
+
+class ReplayTransportTest(LocalServerTestCase):
+
+    def test_Should_ParseFromRecording_When_Replaying(self):
+        transport = ReplayTransport(replay_dir)
+        parser = menu_parser.FMIBistroMenuParser(transport=transport)
+        menus = parser.parse("fmi-bistro")
+
+        with open(os.path.join(replay_dir, "..", "fmi", "in", "Garching-Speiseplan_KW44_2017.txt")) as f:
+            expected = parser.get_menus(f.read(), 2017, 44)
+        with open(os.path.join(replay_dir, "..", "fmi", "in", "Garching-Speiseplan_KW45_2017.txt")) as f:
+            expected.update(parser.get_menus(f.read(), 2017, 45))
+        self.assertEqual(expected, menus)
+
+        parser = menu_parser.StudentenwerkMenuParser(transport=transport)
+        with open(os.path.join(replay_dir, "..", "studentenwerk", "in", "speiseplan_mensa_garching_old.html")) as f:
+            expected = parser.get_menus(html.fromstring(f.read()), "mensa-garching")
+        self.assertEqual(expected, parser.parse("mensa-garching"))
+
+        parser = menu_parser.IPPBistroMenuParser(transport=transport)
+        with open(os.path.join(replay_dir, "..", "ipp", "in", "menu_kw_47_2017.txt")) as f:
+            expected = parser.get_menus(f.read(), 2017, 47)
+        with open(os.path.join(replay_dir, "..", "ipp", "in", "menu_kw_48_2017.txt")) as f:
+            expected.update(parser.get_menus(f.read(), 2017, 48))
+        self.assertEqual(expected, parser.parse("ipp-bistro"))
+
+        parser = menu_parser.MedizinerMensaMenuParser(transport=transport)
+        with open(os.path.join(replay_dir, "..", "mediziner-mensa", "in", "menu_kw_44_2018.txt")) as f:
+            expected = parser.get_menus(f.read(), 2018, 44)
+        self.assertEqual(expected, parser.parse("mediziner-mensa"))
+
+    def test_Should_Raise_When_UrlWasNotRecorded(self):
+        with self.assertRaises(LookupError):
+            ReplayTransport(replay_dir).fetch("http://www.example.com/")
+
+    def test_Should_ReplayRecordedResponses(self):
+        self.server.responses["/menu.html"] = (200, {}, b"<html>menu</html>")
+        self.server.responses["/KW45.pdf"] = (200, {}, b"%PDF week 45")
+        with tempfile.TemporaryDirectory() as record_dir:
+            recorder = RecordingTransport(Transport(timeout=5), record_dir)
+            recorder.fetch(self.url("/menu.html"))
+            recorder.fetch(self.url("/KW45.pdf"))
+            recorder.close()
+
+            replay = ReplayTransport(record_dir)
+            self.assertEqual(b"<html>menu</html>", replay.fetch(self.url("/menu.html")))
+            self.assertEqual(b"%PDF week 45", replay.fetch(self.url("/KW45.pdf")))
+            self.assertTrue(replay.index[self.url("/KW45.pdf")].endswith("-KW45.pdf"))
+        self.assertEqual(2, len(self.server.requests))
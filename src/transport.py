@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Iterator, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import util
+from pdf import PreExtractedText
+
+
+class Transport:
+    """
+    Shared HTTP transport for all menu parsers.
+
+    Keeps one keep-alive connection pool per host, so consecutive requests to the same host (e.g. the 19 Studentenwerk
+    locations) reuse their connections instead of opening a new TCP/TLS connection for every page and every PDF.
+    A transport instance is thread safe and is meant to be shared by all parsers of a run.
+    """
+
+    def __init__(self, pool_size: int = 10, max_per_host: int = 4, timeout: float = 30.0) -> None:
+        """
+        Args:
+            pool_size: The number of connections kept alive per host.
+            max_per_host: The maximum number of concurrent requests to the same host.
+            timeout: Timeout in seconds for connecting to and reading from a host.
+        """
+        self.timeout = timeout
+        self.max_per_host = max_per_host
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._host_limits = {}
+        self._host_limits_lock = threading.Lock()
+
+    def _host_limit(self, url: str) -> threading.Semaphore:
+        host = urlsplit(url).netloc
+        with self._host_limits_lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._host_limits[host]
+
+    def get(self, url: str, headers=None) -> requests.Response:
+        """
+        Sends a GET request, waiting if the maximum number of concurrent requests to the host is reached.
+
+        Raises:
+            requests.HTTPError: If the server answered with an error status code.
+        """
+        with self._host_limit(url):
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+        response.raise_for_status()
+        return response
+
+    def fetch(self, url: str) -> bytes:
+        """Returns the body of the resource at `url`."""
+        return self.get(url).content
+
+    def stream(self, url: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """
+        Yields the body of the resource at `url` in chunks of at most `chunk_size` bytes while it is downloaded.
+
+        Raises:
+            requests.HTTPError: If the server answered with an error status code.
+        """
+        with self._host_limit(url):
+            response = self.session.get(url, timeout=self.timeout, stream=True)
+            try:
+                response.raise_for_status()
+                yield from response.iter_content(chunk_size)
+            finally:
+                response.close()
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def iter_chunks(body: bytes, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Splits an already downloaded body into chunks for transports which cannot stream."""
+    for start in range(0, len(body), chunk_size):
+        yield body[start:start + chunk_size]
+
+
+class CachingTransport:
+    """
+    Persistent HTTP cache on top of a `Transport` using conditional requests.
+
+    The body, `ETag` and `Last-Modified` header of every fetched URL are stored in `directory`. Subsequent fetches of
+    the same URL send `If-None-Match`/`If-Modified-Since` and reuse the stored body if the server answers with
+    `304 Not Modified`. The modification time of an entry is the time of its last validation, so a `304` only touches
+    the entry instead of rewriting the whole body. If `max_age` is set, entries validated less than `max_age` seconds
+    ago are returned without any network access at all.
+    """
+
+    def __init__(self, transport: Transport, directory: str, max_age: Optional[float] = None) -> None:
+        self.transport = transport
+        self.directory = directory
+        self.max_age = max_age
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(url.encode("utf-8")).hexdigest())
+
+    def _load(self, url: str):
+        # an entry consists of one line of JSON metadata followed by the raw body
+        try:
+            with open(self._path(url), "rb") as entry_file:
+                validated = os.fstat(entry_file.fileno()).st_mtime
+                meta = json.loads(entry_file.readline().decode("utf-8"))
+                body = entry_file.read()
+        except (OSError, ValueError):
+            return None, None, None
+        # guard against hash collisions and entries of a different url
+        if meta.get("url") != url:
+            return None, None, None
+        return meta, body, validated
+
+    def _store(self, url: str, meta: dict, body: bytes) -> None:
+        util.atomic_write(self._path(url), json.dumps(meta).encode("utf-8") + b"\n" + body)
+
+    def fetch(self, url: str) -> bytes:
+        """Returns the body of the resource at `url`, revalidating or reusing a cached copy if possible."""
+        meta, body, validated = self._load(url)
+        if meta is not None and self.max_age is not None and time.time() - validated <= self.max_age:
+            return body
+
+        headers = {}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        response = self.transport.get(url, headers)
+        if response.status_code == 304 and meta is not None:
+            # not modified: only refresh the time of the last validation
+            try:
+                os.utime(self._path(url))
+            except FileNotFoundError:
+                pass
+            return body
+
+        meta = {"url": url, "etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+        self._store(url, meta, response.content)
+        return response.content
+
+    def stream(self, url: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        # the whole body is needed for the cache entry anyway
+        return iter_chunks(self.fetch(url), chunk_size)
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class ReplayTransport:
+    """
+    Offline transport serving recorded responses from a directory.
+
+    The file `index.json` in `directory` maps every URL to the file (relative to `directory`) containing its body.
+    Files ending with `.txt` are treated as text already extracted from a PDF (like the parser test assets) and are
+    not passed to `pdftotext` again. Since no network is involved, whole-pipeline runs become reproducible, e.g. for
+    benchmarking.
+    """
+
+    index_name = "index.json"
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        with open(os.path.join(directory, self.index_name), "r") as index_file:
+            self.index = json.load(index_file)
+
+    def fetch(self, url: str) -> bytes:
+        """
+        Returns the recorded body of `url`.
+
+        Raises:
+            LookupError: If no response has been recorded for `url`.
+        """
+        path = self.get_path(url)
+        with open(path, "rb") as body_file:
+            body = body_file.read()
+        if path.endswith(".txt"):
+            return PreExtractedText(body)
+        return body
+
+    def stream(self, url: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """Yields the recorded body of `url` in chunks of at most `chunk_size` bytes while it is read."""
+        with open(self.get_path(url), "rb") as body_file:
+            yield from iter(lambda: body_file.read(chunk_size), b"")
+
+    def get_path(self, url: str) -> str:
+        if url not in self.index:
+            raise LookupError("No recorded response for %s in %s" % (url, self.directory))
+        return os.path.join(self.directory, self.index[url])
+
+    def close(self) -> None:
+        pass
+
+
+class RecordingTransport:
+    """
+    Records all responses fetched through `transport` into `directory` in the layout read by `ReplayTransport`.
+    """
+
+    def __init__(self, transport, directory: str) -> None:
+        self.transport = transport
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with open(os.path.join(directory, ReplayTransport.index_name), "r") as index_file:
+                self.index = json.load(index_file)
+        except FileNotFoundError:
+            self.index = {}
+
+    @staticmethod
+    def get_file_name(url: str) -> str:
+        # keep the original file name for readability, the hash prefix makes it unique
+        name = os.path.basename(urlsplit(url).path) or "index.html"
+        if "." not in name:
+            name += ".html"
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()[:12] + "-" + name
+
+    def fetch(self, url: str) -> bytes:
+        body = self.transport.fetch(url)
+        file_name = self.get_file_name(url)
+        with self._lock:
+            # an interrupted recording never leaves a truncated body or index behind
+            util.atomic_write(os.path.join(self.directory, file_name), body)
+            self.index[url] = file_name
+            util.atomic_write(os.path.join(self.directory, ReplayTransport.index_name), json.dumps(
+                self.index, indent=4, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+        return body
+
+    def stream(self, url: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        # the whole body is needed for the recording anyway
+        return iter_chunks(self.fetch(url), chunk_size)
+
+    def close(self) -> None:
+        self.transport.close()
@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 
+import os
+import tempfile
 from datetime import datetime
 
 date_pattern = "%d.%m.%Y"
@@ -10,6 +12,29 @@ def parse_date(date_str):
     return datetime.strptime(date_str, date_pattern).date()
 
 
+def atomic_write(path, data, mode=None):
+    """
+    Writes the bytes `data` to `path`. They are written to a temporary file in the same directory first, which then
+    replaces `path`, so that concurrent readers never see a partially written file.
+
+    Args:
+        path: The path of the file.
+        data: The content of the file.
+        mode: The permissions of the file; by default only its owner can read it.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as temp_file:
+            temp_file.write(data)
+        if mode is not None:
+            os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
 def make_duplicates_unique(names_with_duplicates):
     counts = [1] * len(names_with_duplicates)
     checked_names = []